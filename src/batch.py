@@ -0,0 +1,318 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import concurrent.futures
+import pandas
+import effectsize
+# Note that in the function documentation the term standardized difference (SD) is preferred over effect size; both terms have the same meaning
+
+logger = logging.getLogger("effectsize.batch")
+
+#%%
+
+def read_manifest(path):
+    
+    """
+    
+    Reads a manifest of inputs and specifications from a JSON (or, if PyYAML is installed, YAML) file
+    
+    Parameters:
+        path (str): Path to the manifest, in the format: {'inputs': {input name: path to CSV or Parquet file}, 'specs': [specification, ...]}
+        Each specification is a dictionary of arguments for effectsize.compute(), with an 'input' name and a 'name' used for the output file
+    
+    Returns:
+        Dictionary containing the manifest
+    
+    """
+    
+    with open(path) as file:
+        
+        if path.endswith(('.yaml', '.yml')):
+            
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("Reading YAML manifests requires PyYAML, e.g. pip install effectsize[yaml]")
+            
+            manifest = yaml.safe_load(file)
+        
+        else:
+            
+            manifest = json.load(file)
+    
+    assert type(manifest) == dict and type(manifest.get('inputs')) == dict and type(manifest.get('specs')) == list, "Manifest must contain a dictionary of inputs and a list of specs"
+    
+    names = [spec.get('name') for spec in manifest['specs']]
+    
+    for spec in manifest['specs']:
+        assert type(spec.get('name')) == str and spec.get('input') in manifest['inputs'], "Each spec must have a name and one of the inputs"
+    
+    assert len(set(names)) == len(names), "The names of the specs must be unique"
+    
+    return manifest
+
+#%%
+
+def spec_columns(spec):
+    
+    """
+    
+    Returns the columns of the input which are used by a specification
+    
+    """
+    
+    columns = [spec['group']] + spec.get('continuous', []) + spec.get('categorical', [])
+    
+    for argument in ['weights', 'matches', 'frequencies', 'cluster']:
+        if spec.get(argument) != None:
+            columns.append(spec[argument])
+    
+    return columns
+
+#%%
+
+def load_input(path,
+               columns):
+    
+    """
+    
+    Reads the columns of a CSV or Parquet file which are used by any specification
+    
+    Parameters:
+        path (str): Path to the CSV or Parquet file
+        columns (list): Names of the columns which should be read
+    
+    Returns:
+        Pandas DataFrame containing the columns
+    
+    """
+    
+    if path.endswith('.parquet'):
+        return pandas.read_parquet(path, columns = columns)
+    
+    return pandas.read_csv(path, usecols = lambda column: column in columns)
+
+#%%
+
+def compatible(spec,
+               other):
+    
+    """
+    
+    Returns whether two specifications use their common variables in the same way (continuous, categorical or skewed), so that they can share a cohort
+    
+    """
+    
+    continuous = set(spec.get('continuous', [])) & set(other.get('continuous', []))
+    
+    if set(spec.get('continuous', [])) & set(other.get('categorical', [])) or set(spec.get('categorical', [])) & set(other.get('continuous', [])):
+        return False
+    
+    return not continuous & (set(spec.get('skewed', [])) ^ set(other.get('skewed', [])))
+
+def prepare_cohorts(data,
+                    specs):
+    
+    """
+    
+    Prepares the cohorts of an input, each holding the variables of the specifications which use the same group variable and are compatible with each other
+    A specification which uses a variable differently from the others (e.g. ranked in one specification and not in another) is given its own cohort
+    
+    Parameters:
+        data (dataframe): Pandas DataFrame containing the input
+        specs (list): Specifications which use the input
+    
+    Returns:
+        Dictionary in the format: {name of specification: Cohort}
+    
+    """
+    
+    # Each specification joins the first set of specifications with its group variable with which it is compatible
+    
+    grouped = []
+    
+    for spec in specs:
+        
+        for others in grouped:
+            
+            if others[0]['group'] == spec['group'] and all(compatible(spec, other) for other in others):
+                others.append(spec)
+                break
+        
+        else:
+            
+            grouped.append([spec])
+    
+    cohorts = {}
+    
+    for others in grouped:
+        
+        cohort = effectsize.prepare(data = data,
+                                    group = others[0]['group'],
+                                    continuous = list(dict.fromkeys(variable for spec in others for variable in spec.get('continuous', []))),
+                                    categorical = list(dict.fromkeys(variable for spec in others for variable in spec.get('categorical', []))),
+                                    skewed = list(dict.fromkeys(variable for spec in others for variable in spec.get('skewed', []))))
+        
+        for spec in others:
+            cohorts[spec['name']] = cohort
+    
+    return cohorts
+
+#%%
+
+def run_spec(spec,
+             data,
+             cohort):
+    
+    """
+    
+    Computes the SDs of a specification, from the prepared cohort unless it requires arguments which only effectsize.compute() takes
+    
+    Parameters:
+        spec (dict): Specification, as in the manifest
+        data (dataframe): Pandas DataFrame containing the input
+        cohort (cohort): Cohort prepared for the specification, as returned by prepare_cohorts()
+    
+    Returns:
+        List in the format: [Pandas DataFrame containing the computed SDs, number of seconds taken]
+    
+    """
+    
+    start = time.perf_counter()
+    
+    arguments = {key: value for key, value in spec.items() if key not in ['name', 'input']}
+    
+    if set(arguments) <= {'group', 'continuous', 'categorical', 'skewed', 'weights', 'decimals', 'intervals'}:
+        
+        variables = arguments.get('continuous', []) + arguments.get('categorical', [])
+        
+        results = cohort.compute(variables = [variable for variable in variables if variable in cohort.variables],
+                                 weights = arguments.get('weights'),
+                                 decimals = arguments.get('decimals', 2),
+                                 intervals = arguments.get('intervals'))
+    
+    else:
+        
+        results = effectsize.compute(data = data, **arguments)
+    
+    return [results, time.perf_counter() - start]
+
+#%%
+
+def run_batch(manifest,
+              output,
+              fileformat = 'csv',
+              workers = None):
+    
+    """
+    
+    Computes the SDs of all specifications of a manifest, reading each input once and sharing the prepared cohorts between specifications
+    Inputs and specifications which fail are logged and skipped, so that the results of the other specifications are still written
+    
+    Parameters:
+        manifest (dict): Manifest as returned by read_manifest()
+        output (str): Directory to which the results of each specification are written, as {name}.csv or {name}.parquet
+        fileformat (str): Format of the results, out of 'csv' and 'parquet'
+        workers (None or int): Number of threads across which the specifications are computed (otherwise as for concurrent.futures.ThreadPoolExecutor)
+    
+    Returns:
+        Dictionary in the format: {name of specification: number of seconds taken}, for the specifications which were computed
+    
+    """
+    
+    assert fileformat in ['csv', 'parquet'], "Format must be specified as 'csv' or 'parquet'"
+    
+    os.makedirs(output, exist_ok = True)
+    
+    timings = {}
+    futures = {}
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers = workers) as executor:
+        
+        for name, path in manifest['inputs'].items():
+            
+            specs = [spec for spec in manifest['specs'] if spec['input'] == name]
+            
+            if len(specs) == 0:
+                continue
+            
+            # Reading only the columns used by the specs and preparing the group codes, NA masks and values once
+            
+            start = time.perf_counter()
+            
+            try:
+                data = load_input(path = path, columns = list(dict.fromkeys(column for spec in specs for column in spec_columns(spec))))
+                cohorts = prepare_cohorts(data = data, specs = specs)
+            except Exception:
+                logger.exception("Failed to load input %s", name)
+                continue
+            
+            logger.info("Loaded input %s (%d rows) in %.3f seconds", name, len(data), time.perf_counter() - start)
+            
+            for spec in specs:
+                futures[executor.submit(run_spec, spec, data, cohorts[spec['name']])] = spec['name']
+        
+        for future in concurrent.futures.as_completed(futures):
+            
+            name = futures[future]
+            
+            try:
+                
+                results, seconds = future.result()
+                
+                if fileformat == 'csv':
+                    results.to_csv(os.path.join(output, name + '.csv'))
+                else:
+                    results.set_axis([str(column) for column in results.columns], axis = 1).to_parquet(os.path.join(output, name + '.parquet'))
+            
+            except Exception:
+                logger.exception("Failed to compute spec %s", name)
+                continue
+            
+            timings[name] = seconds
+            logger.info("Computed spec %s in %.3f seconds", name, seconds)
+    
+    return timings
+
+#%%
+
+def main(argv = None):
+    
+    """
+    
+    Command-line entry point, e.g. effectsize-batch manifest.json --output results --format parquet --workers 8
+    Returns the exit code, which is 1 if any specification failed
+    
+    """
+    
+    parser = argparse.ArgumentParser(prog = "effectsize-batch", description = "Computes effect sizes for every specification in a JSON or YAML manifest")
+    parser.add_argument("manifest", help = "path to the manifest of inputs and specifications")
+    parser.add_argument("--output", default = "results", help = "directory to which the results are written (default: results)")
+    parser.add_argument("--format", default = "csv", choices = ["csv", "parquet"], help = "format of the results (default: csv)")
+    parser.add_argument("--workers", type = int, default = None, help = "number of threads across which the specifications are computed")
+    parser.add_argument("--quiet", action = "store_true", help = "do not log the timings")
+    
+    arguments = parser.parse_args(argv)
+    
+    logging.basicConfig(level = logging.WARNING if arguments.quiet else logging.INFO, format = "%(asctime)s %(message)s")
+    
+    start = time.perf_counter()
+    
+    manifest = read_manifest(path = arguments.manifest)
+    timings = run_batch(manifest = manifest, output = arguments.output, fileformat = arguments.format, workers = arguments.workers)
+    
+    logger.info("Computed %d specs in %.3f seconds", len(timings), time.perf_counter() - start)
+    
+    failed = [spec['name'] for spec in manifest['specs'] if spec['name'] not in timings]
+    
+    if len(failed) > 0:
+        logger.error("Failed to compute %d specs: %s", len(failed), ", ".join(failed))
+        return 1
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
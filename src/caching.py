@@ -0,0 +1,287 @@
+import os
+import time
+import pickle
+import hashlib
+import tempfile
+import threading
+import collections
+import pandas
+# Note that in the function documentation the term standardized difference (SD) is preferred over effect size; both terms have the same meaning
+
+#%%
+
+def cache_key(data,
+              columns,
+              arguments):
+    
+    """
+    
+    Computes the key under which a result is cached, from a fingerprint of the contents of the involved columns and the arguments
+       
+    Parameters:
+        data (dataframe): Pandas DataFrame containing observations (rows) and variables (columns)
+        columns (list): Names of the columns involved in the computation
+        arguments (dict): Arguments which determine the result
+    
+    Returns:
+        Hexadecimal string which is the key of the result
+        
+    """
+    
+    digest = hashlib.sha256()
+    digest.update(repr(sorted(arguments.items())).encode())
+    
+    for column in columns:
+        
+        digest.update(repr(column).encode())
+        digest.update(str(data[column].dtype).encode())
+        digest.update(pandas.util.hash_pandas_object(data[column], index = False).to_numpy().tobytes())
+    
+    return digest.hexdigest()
+
+#%%
+
+class Cache:
+    
+    """
+    
+    Base class for result caches, which keeps track of hits, misses and evictions
+    
+    Parameters:
+        ttl (None or float): Number of seconds after which a cached result expires (otherwise results do not expire)
+    
+    Attributes:
+        hits (int): Number of lookups for which a cached result was returned
+        misses (int): Number of lookups for which no (unexpired) cached result was found
+        evictions (int): Number of cached results removed because they expired or the cache was full
+    
+    """
+    
+    def __init__(self,
+                 ttl = None):
+        
+        assert ttl == None or ttl > 0, "Time to live must be specified as None or a positive number of seconds"
+        
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+    
+    def expired(self,
+                stored):
+        
+        return self.ttl != None and time.time() - stored > self.ttl
+    
+    def get(self,
+            key):
+        
+        """
+        
+        Returns the cached result for the key, or None if there is no (unexpired) cached result
+        
+        """
+        
+        with self.lock:
+            
+            result = self.load(key)
+            
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            
+            return result
+    
+    def set(self,
+            key,
+            result):
+        
+        """
+        
+        Caches the result under the key, evicting the least recently used results if the cache is full
+        
+        """
+        
+        with self.lock:
+            self.store(key, result)
+    
+    def info(self):
+        
+        """
+        
+        Returns a dictionary with the number of hits, misses, evictions and cached results, for monitoring
+        
+        """
+        
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self)}
+
+#%%
+
+class MemoryCache(Cache):
+    
+    """
+    
+    In-memory result cache with least recently used (LRU) eviction
+    
+    Parameters:
+        maxsize (int): Maximum number of cached results
+        ttl (None or float): Number of seconds after which a cached result expires (otherwise results do not expire)
+    
+    """
+    
+    def __init__(self,
+                 maxsize = 128,
+                 ttl = None):
+        
+        assert type(maxsize) == int and maxsize > 0, "Maximum size must be specified as a positive integer"
+        
+        super().__init__(ttl = ttl)
+        
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+    
+    def __len__(self):
+        
+        return len(self.entries)
+    
+    def load(self,
+             key):
+        
+        if key not in self.entries:
+            return None
+        
+        stored, result = self.entries[key]
+        
+        if self.expired(stored):
+            del self.entries[key]
+            self.evictions += 1
+            return None
+        
+        self.entries.move_to_end(key)
+        
+        return result.copy()
+    
+    def store(self,
+              key,
+              result):
+        
+        self.entries[key] = (time.time(), result.copy())
+        self.entries.move_to_end(key)
+        
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last = False)
+            self.evictions += 1
+
+#%%
+
+class DiskCache(Cache):
+    
+    """
+    
+    On-disk result cache (one pickle file per result) with least recently used (LRU) eviction
+    
+    Parameters:
+        directory (str): Directory in which the results are stored
+        maxbytes (int): Maximum total size of the cached results, in bytes
+        ttl (None or float): Number of seconds after which a cached result expires (otherwise results do not expire)
+    
+    """
+    
+    def __init__(self,
+                 directory,
+                 maxbytes = 100 * 1024 ** 2,
+                 ttl = None):
+        
+        assert type(directory) == str, "Directory must be specified as a string"
+        assert type(maxbytes) == int and maxbytes > 0, "Maximum size must be specified as a positive integer number of bytes"
+        
+        super().__init__(ttl = ttl)
+        
+        self.directory = directory
+        self.maxbytes = maxbytes
+        
+        os.makedirs(directory, exist_ok = True)
+    
+    def __len__(self):
+        
+        return len(self.files())
+    
+    def files(self):
+        
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.pkl')]
+    
+    def load(self,
+             key):
+        
+        path = os.path.join(self.directory, key + '.pkl')
+        
+        try:
+            
+            # The modification time is the time of the last access, the creation time is stored in the file
+            
+            with open(path, 'rb') as file:
+                stored, result = pickle.load(file)
+            
+        except (OSError, EOFError, pickle.UnpicklingError):
+            
+            return None
+        
+        # Files may be removed by another process sharing the directory at any time, which is treated as an eviction
+        
+        if self.expired(stored):
+            
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            
+            return None
+        
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        
+        return result
+    
+    def store(self,
+              key,
+              result):
+        
+        # Writing to a temporary file first, so that other processes never read a partially written result
+        
+        handle, temporary = tempfile.mkstemp(dir = self.directory, suffix = '.tmp')
+        
+        with os.fdopen(handle, 'wb') as file:
+            pickle.dump((time.time(), result), file, protocol = pickle.HIGHEST_PROTOCOL)
+        
+        os.replace(temporary, os.path.join(self.directory, key + '.pkl'))
+        
+        # Evicting the least recently used results until the cache is within its size limit (skipping files removed by another process in the meantime)
+        
+        files = []
+        
+        for path in self.files():
+            
+            try:
+                status = os.stat(path)
+            except FileNotFoundError:
+                continue
+            
+            files.append([status.st_mtime, status.st_size, path])
+        
+        files.sort()
+        total = sum(size for modified, size, path in files)
+        
+        while total > self.maxbytes and len(files) > 1:
+            
+            modified, size, path = files.pop(0)
+            total -= size
+            
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,304 @@
+import numpy
+import pandas
+from functions import compute_codes, compute_moments, combine_moments, merge_pairwise, compute_stdiff, compute_bounds, compute_mahalanobis, compute_distribution, compute_frequency_ranks, compact_values, format_results
+# Note that in the function documentation the term standardized difference (SD) is preferred over effect size; both terms have the same meaning
+
+#%%
+
+class Cohort:
+    
+    """
+    
+    Prepared cohort, holding the group codes and the arrays of the specified variables so that repeated computations reuse them
+    Category codes, ranks and weights are extracted when first needed and then kept
+    
+    Parameters:
+        data (dataframe): Pandas DataFrame containing observations (rows) and variables (columns)
+        group (str): Variable defining the two groups
+        variables (list): Names of the variables, in the order in which they appear in the dataframe
+        continuous (list): List of string items which are names of the continuous variables
+        skewed (list): List of string items which are names of the continuous variables which have a skewed distribution (ranked SD computed)
+        compact (bool): Whether values are stored in narrow types (integer values in the narrowest integer type, float32 values and weights kept as float32, uint16 category codes) and the SDs computed in blocks of rows
+        downcast (bool): Whether float64 values and weights are also stored as float32 if compact (rounding them to about 7 significant digits)
+        blocksize (int): Number of rows for which sufficient statistics are computed at once (in float64) if compact
+    
+    Attributes:
+        codes (array): Group codes as returned by compute_codes()
+        values (dict): Numpy array of values of each continuous variable
+        masks (dict): Bitmask (as packed by numpy.packbits) of the missing values of each variable
+    
+    """
+    
+    def __init__(self,
+                 data,
+                 group,
+                 variables,
+                 continuous = [],
+                 skewed = [],
+                 compact = False,
+                 downcast = False,
+                 blocksize = 65536):
+        
+        assert type(blocksize) == int and blocksize > 0 and blocksize % 8 == 0, "Block size must be specified as a positive multiple of 8"
+        
+        self.data = data
+        self.group = group
+        self.variables = variables
+        self.continuous = [variable for variable in variables if variable in continuous]
+        self.skewed = [variable for variable in self.continuous if variable in skewed]
+        self.compact = compact
+        self.downcast = downcast
+        self.blocksize = blocksize
+        
+        self.rows = len(data)
+        self.codes = compute_codes(data[group])
+        self.values = {}
+        self.masks = {}
+        
+        for variable in variables:
+            
+            if variable in self.continuous and compact:
+                self.values[variable] = compact_values(data[variable], downcast = downcast)
+                self.masks[variable] = numpy.packbits(data[variable].isna().to_numpy())
+            elif variable in self.continuous:
+                self.values[variable] = data[variable].to_numpy(dtype = numpy.float64)
+                self.masks[variable] = numpy.packbits(numpy.isnan(self.values[variable]))
+            else:
+                self.masks[variable] = numpy.packbits(data[variable].isna().to_numpy())
+        
+        self.categories = {}
+        self.ranks = {}
+        self.weights = {}
+    
+    def __len__(self):
+        
+        return self.rows
+    
+    def missing(self,
+                variable,
+                start = 0,
+                stop = None):
+        
+        """
+        
+        Returns a boolean array which is True for the observations (from row start, a multiple of 8, to row stop) with a missing value of the variable
+        
+        """
+        
+        stop = self.rows if stop == None else stop
+        
+        return numpy.unpackbits(self.masks[variable][start // 8:], count = stop - start).astype(bool)
+    
+    def category_codes(self,
+                       variable):
+        
+        """
+        
+        Returns the level codes of a categorical variable, where missing values are coded as -1 (or 0 if compact, as they are given by the bitmask)
+        
+        """
+        
+        if variable not in self.categories:
+            
+            categories = pandas.factorize(self.data[variable], sort = True)[0]
+            
+            if self.compact and categories.max() < 2 ** 16:
+                categories = numpy.where(categories < 0, 0, categories).astype(numpy.uint16)
+            
+            self.categories[variable] = categories
+        
+        return self.categories[variable]
+    
+    def rank_values(self,
+                    variable):
+        
+        """
+        
+        Returns the (average) ranks of a continuous variable, where missing values have missing ranks
+        
+        """
+        
+        if variable not in self.ranks:
+            
+            values = numpy.where(self.missing(variable), numpy.nan, self.values[variable])
+            
+            self.ranks[variable] = compute_distribution(values = values, codes = self.codes)[0]
+        
+        return self.ranks[variable]
+    
+    def weight_values(self,
+                      weights):
+        
+        """
+        
+        Returns the weights for each observation, where the weights of observations with a missing weight are missing
+        
+        """
+        
+        if weights == None:
+            return numpy.ones(shape = self.rows, dtype = numpy.int8 if self.compact else numpy.float64)
+        
+        if weights not in self.weights:
+            
+            assert weights in list(self.data), "Weight variable could not be found in dataframe columns"
+            
+            dtype = numpy.float32 if self.compact and (self.downcast or self.data[weights].dtype == numpy.float32) else numpy.float64
+            self.weights[weights] = self.data[weights].to_numpy(dtype = dtype, na_value = numpy.nan)
+        
+        return self.weights[weights]
+    
+    def frequency_values(self,
+                         matches = None,
+                         frequencies = None):
+        
+        """
+        
+        Returns the number of times each observation is in the matched sample, from matched-set IDs (observations with a missing ID are not matched) or frequencies
+        
+        """
+        
+        assert matches is None or frequencies is None, "Only one of matches and frequencies can be specified"
+        
+        column = matches if frequencies is None else frequencies
+        
+        if type(column) == str:
+            
+            assert column in list(self.data), "Matches and frequencies must be specified as variables found in dataframe columns, or arrays"
+            
+            column = self.data[column]
+        
+        assert len(column) == self.rows, "Matches and frequencies must have one value for each observation"
+        
+        if frequencies is None:
+            return (~pandas.isna(numpy.asarray(column))).astype(numpy.float64)
+        
+        counts = numpy.nan_to_num(numpy.asarray(column, dtype = numpy.float64), nan = 0.0)
+        
+        assert (counts >= 0).all(), "Frequencies must not be negative"
+        
+        return counts
+    
+    def compute(self,
+                variables = None,
+                weights = None,
+                decimals = 2,
+                intervals = None,
+                matches = None,
+                frequencies = None):
+        
+        """
+        
+        Computes SDs for the prepared variables, reusing the prepared arrays
+        
+        Parameters:
+            variables (None or list): Names of the prepared variables for which the SD should be computed (otherwise all prepared variables)
+            weights (None or str): Variable defining weights for each observation (otherwise assumed to be equally weighted)
+            decimals (int): Number of decimal places which should be computed
+            intervals (None or float): Whether CIs should be computed and with what coverage e.g. for 95% CI, intervals = 0.95
+            matches (None, str or array): Variable or array of matched-set IDs, the matched sample being the observations with an ID
+            frequencies (None, str or array): Variable or array of the number of times each observation is in the matched sample (e.g. when matching with replacement)
+        
+        Returns:
+            Pandas DataFrame containing the computed SDs (and CIs, if specified)
+        
+        """
+        
+        assert variables == None or (type(variables) == list and all(variable in self.variables for variable in variables)), "Variables must be specified as None or inside a list, out of the prepared variables"
+        assert weights == None or type(weights) == str, "If weight variable is present, it must be specified as a string"
+        assert type(decimals) == int, "Number of decimal places must be specified as an integer"
+        assert intervals == None or (intervals > 0 and intervals < 1), "CIs must be specified as None or in range (0,1) e.g. for 95% CI, intervals = 0.95"
+        
+        if variables == None:
+            variables = self.variables
+        
+        ordered_variables = [variable for variable in self.variables if variable in variables]
+        
+        wgts = self.weight_values(weights)
+        
+        # Matched samples are computed from the matched observations only, weighted by the number of times each is matched
+        
+        if matches is None and frequencies is None:
+            
+            index = None
+            codes = self.codes
+        
+        else:
+            
+            counts = self.frequency_values(matches = matches, frequencies = frequencies)
+            index = numpy.flatnonzero(counts > 0)
+            codes = self.codes[index]
+            wgts = wgts[index] * counts[index]
+        
+        def observed(variable, missing, start, stop):
+            
+            # Observations of the block with a group, weight and value
+            
+            missing = self.missing(variable, start, stop) if missing is None else missing[start:stop]
+            
+            return (codes[start:stop] >= 0) & ~numpy.isnan(wgts[start:stop]) & ~missing
+        
+        # Compact cohorts are computed in blocks of rows, so that only one block at a time is converted to float64
+        
+        step = self.blocksize if self.compact else max(len(codes), 1)
+        blocks = [[start, min(start + step, len(codes))] for start in range(0, max(len(codes), 1), step)]
+        
+        results = []
+        
+        for variable in ordered_variables:
+            
+            partials = []
+            missing = None if index is None else self.missing(variable)[index]
+            
+            if variable in self.continuous:
+                
+                # Computing the SD from the sufficient statistics of the values (or ranks, of the matched sample if matched)
+                
+                if index is None and variable in self.skewed:
+                    values = self.rank_values(variable)
+                elif index is None:
+                    values = self.values[variable]
+                elif variable in self.skewed:
+                    values = compute_frequency_ranks(values = numpy.where(missing, numpy.nan, self.values[variable][index]), frequencies = counts[index])
+                else:
+                    values = self.values[variable][index]
+                
+                for start, stop in blocks:
+                    
+                    rows = observed(variable, missing, start, stop)
+                    
+                    partials.append(compute_moments(values = values[start:stop][rows], codes = codes[start:stop][rows], weights = wgts[start:stop][rows]))
+                
+                moments = merge_pairwise(partials = partials, combine = combine_moments)
+                
+                stdiff = compute_stdiff(moments = moments).round(decimals)
+                total = moments[0]
+            
+            else:
+                
+                # Computing the SD from the weighted table of levels by group, dropping levels which are not observed
+                
+                categories = self.category_codes(variable)
+                width = int(categories.max()) + 1
+                
+                if index is not None:
+                    categories = categories[index]
+                
+                for start, stop in blocks:
+                    
+                    rows = observed(variable, missing, start, stop)
+                    cells = codes[start:stop][rows].astype(numpy.int64) * width + categories[start:stop][rows]
+                    
+                    partials.append(numpy.bincount(cells, weights = wgts[start:stop][rows], minlength = 2 * width).reshape(2, width))
+                
+                table = merge_pairwise(partials = partials, combine = numpy.add)
+                table = table[:, table.sum(axis = 0) > 0]
+                total = table.sum(axis = 1)
+                
+                stdiff = compute_mahalanobis(prob0 = table[None, 0] / total[0], prob1 = table[None, 1] / total[1])[0].round(decimals)
+            
+            if intervals == None:
+                results.append(stdiff)
+            else:
+                results.append((stdiff, compute_bounds(stdiff = stdiff, n0 = total[0], n1 = total[1], decimals = decimals, coverage = intervals)))
+        
+        return format_results(results = results, variables = ordered_variables, intervals = intervals)
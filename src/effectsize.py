@@ -1,9 +1,62 @@
+import asyncio
+import functools
+import numpy
 import pandas
-from functions import list_filter, compute_continuous, compute_categorical
+from caching import Cache, MemoryCache, DiskCache, cache_key
+from cohort import Cohort
+from functions import list_filter, compute_variable, format_results, compute_permutations, compute_imputed, pool_stdiff, compute_dask, is_dask, compute_products, compute_windowed, compute_clustered, compute_codes, compute_screening, prepare_sparse
 # Note that in the function documentation the term standardized difference (SD) is preferred over effect size; both terms have the same meaning
 
 #%%
 
+def check_inputs(data,
+                 group,
+                 continuous = [],
+                 categorical = [],
+                 skewed = [],
+                 weights = None,
+                 decimals = 2,
+                 intervals = None,
+                 chunksize = None,
+                 metrics = []):
+    
+    """
+    
+    Asserts the input types for compute() and returns the variables for which SDs should be computed
+    
+    Parameters:
+        As for compute()
+    
+    Returns:
+        List of the variables found in the dataframe, in the order in which they appear in the dataframe
+
+    """
+      
+    # Asserting input types
+    
+    assert type(data) == pandas.DataFrame or type(data) == pandas.core.frame.DataFrame or is_dask(data), "Data must be specified as a Pandas (or Dask) DataFrame"        
+    assert type(group) == str, "Group variable must be specified as a string"
+    assert type(continuous) == list and type(categorical) == list and type(skewed) == list, "Variable names must be specified inside lists"
+    assert weights == None or type(weights) == str, "If weight variable is present, it must be specified as a string"
+    assert type(decimals) == int, "Number of decimal places must be specified as an integer"
+    assert intervals == None or (intervals > 0 and intervals < 1), "CIs must be specified as None or in range (0,1) e.g. for 95% CI, intervals = 0.95"
+    assert chunksize == None or (type(chunksize) == int and chunksize > 0), "Chunk size must be specified as None or a positive integer"
+    assert type(metrics) == list and all(metric in ['variance', 'ks', 'ecdf'] for metric in metrics), "Metrics must be specified inside a list, out of 'variance', 'ks' and 'ecdf'"
+        
+    # Get combined list of variables and sort them into the order in which they appear in the dataframe
+    
+    specified_variables = (continuous + categorical).copy()
+    all_variables = list(data)
+    
+    for variable in specified_variables:
+        assert type(variable) == str, "The variable names inside lists must all be specified as strings"
+        if variable not in all_variables: 
+            print("The following variable was not computed as it could not be found in dataframe columns:", variable)        
+    
+    return list_filter(list1 = all_variables, list2 = specified_variables)
+
+#%%
+
 def compute(data,
             group,
             continuous = [],
@@ -11,14 +64,24 @@ def compute(data,
             skewed = [],
             weights = None,
             decimals = 2,
-            intervals = None):
+            intervals = None,
+            chunksize = None,
+            metrics = [],
+            terms = [],
+            cache = None,
+            permutations = None,
+            seed = None,
+            workers = None,
+            matches = None,
+            frequencies = None,
+            cluster = None):
     
     """
     
     Computes SDs for all specified variables
     
     Parameters:
-        data (dataframe): Pandas DataFrame containing observations (rows) and variables (columns)
+        data (dataframe): Pandas DataFrame (or Dask DataFrame) containing observations (rows) and variables (columns)
         exposure (str): Variable defining the two groups
         continuous (list): List of string items which are names of the continuous variables for which the SD should be computed
         categorical (list): List of string items which are names of the categorical variables for which the SD should be computed
@@ -26,88 +89,554 @@ def compute(data,
         weights (None or str): Variable defining weights for each observation (otherwise assumed to be equally weighted)
         decimals (int): Number of decimal places which should be computed
         intervals (None or float): Whether CIs should be computed and with what coverage e.g. for 95% CI, intervals = 0.95
+        chunksize (None or int): For skewed variables, number of observations ranked in memory at once, with sorted chunks spilled to temporary files (otherwise the whole variable is ranked in memory)
+        metrics (list): Distributional balance metrics which should be computed for continuous variables, out of 'variance' (variance ratio), 'ks' (Kolmogorov-Smirnov statistic) and 'ecdf' (mean eCDF difference)
+        terms (list): Derived terms of the (non-skewed) continuous variables for which SDs should be computed, out of 'squares' (e.g. var1^2) and 'products' (pairwise products, e.g. var1 * var2)
+        cache (None or cache): MemoryCache or DiskCache in which the results are cached, keyed on the contents of the involved columns and the arguments
+        permutations (None or int): Whether permutation test p-values should be computed and with how many permutations of the group labels
+        seed (None or int): Seed for the random number generator used for the permutations
+        workers (None or int): Number of threads across which the computations (blocks of rows and permutations) are run (otherwise run in a single thread)
+        matches (None or str): Variable defining the matched-set ID of each observation, the SDs being computed for the matched sample (observations with an ID)
+        frequencies (None or str): Variable defining the number of times each observation is in the matched sample (e.g. when matching with replacement), the SDs being computed for the matched sample
+        cluster (None or str): Variable defining the cluster (e.g. patient ID) of each observation, the SDs being computed with one observation per cluster (the mean of its rows)
     
     Returns:
-        Pandas DataFrame containing the computed SDs (and CIs, if specified)
+        Pandas DataFrame containing the computed SDs (and CIs and p-values, if specified)
 
     """
+    
+    assert cache == None or isinstance(cache, Cache), "Cache must be specified as None, a MemoryCache or a DiskCache"
+    assert permutations == None or (type(permutations) == int and permutations > 0), "Permutations must be specified as None or a positive integer"
+    assert seed == None or type(seed) == int, "Seed must be specified as None or an integer"
+    assert workers == None or (type(workers) == int and workers > 0), "Workers must be specified as None or a positive integer"
+    assert type(terms) == list and all(term in ['squares', 'products'] for term in terms), "Terms must be specified inside a list, out of 'squares' and 'products'"
+    assert (matches == None or type(matches) == str) and (frequencies == None or type(frequencies) == str), "If matches or frequencies are present, they must be specified as strings"
+    assert matches == None or frequencies == None, "Only one of matches and frequencies can be specified"
+    assert cluster == None or type(cluster) == str, "If cluster variable is present, it must be specified as a string"
       
-    # Asserting input types
+    ordered_variables = check_inputs(data = data,
+                                     group = group,
+                                     continuous = continuous,
+                                     categorical = categorical,
+                                     skewed = skewed,
+                                     weights = weights,
+                                     decimals = decimals,
+                                     intervals = intervals,
+                                     chunksize = chunksize,
+                                     metrics = metrics)
     
-    assert type(data) == pandas.DataFrame or type(data) == pandas.core.frame.DataFrame, "Data must be specified as a Pandas DataFrame"        
-    assert type(group) == str, "Group variable must be specified as a string"
-    assert type(continuous) == list and type(categorical) == list and type(skewed) == list, "Variable names must be specified inside lists"
-    assert weights == None or type(weights) == str, "If weight variable is present, it must be specified as a string"
-    assert type(decimals) == int, "Number of decimal places must be specified as an integer"
-    assert intervals == None or (intervals > 0 and intervals < 1), "CIs must be specified as None or in range (0,1) e.g. for 95% CI, intervals = 0.95"
+    # Dask DataFrames are computed as a single task graph
+    
+    if is_dask(data):
         
-    # Get combined list of variables and sort them into the order in which they appear in the dataframe
+        assert skewed == [] and chunksize == None and metrics == [] and terms == [] and cache == None and permutations == None and matches == None and frequencies == None and cluster == None, "Skewed variables, chunksize, metrics, terms, cache, permutations, matches, frequencies and clusters are not supported for Dask DataFrames"
+        
+        results = compute_dask(data = data,
+                               group = group,
+                               variables = ordered_variables,
+                               continuous = continuous,
+                               weights = weights,
+                               decimals = decimals,
+                               intervals = intervals)
+        
+        return format_results(results = results, variables = ordered_variables, intervals = intervals)
     
-    specified_variables = (continuous + categorical).copy()
-    all_variables = list(data)
+    # Returning the cached results, if the same columns and arguments have been computed before
     
-    for variable in specified_variables:
-        assert type(variable) == str, "The variable names inside lists must all be specified as strings"
-        if variable not in all_variables: 
-            print("The following variable was not computed as it could not be found in dataframe columns:", variable)        
+    if cache != None:
+        
+        columns = [group] + ordered_variables + [column for column in [weights, matches, frequencies, cluster] if column != None]
+        arguments = {'group': group, 'continuous': continuous, 'categorical': categorical, 'skewed': skewed,
+                     'weights': weights, 'decimals': decimals, 'intervals': intervals, 'metrics': metrics, 'terms': terms, 'permutations': permutations, 'seed': seed,
+                     'matches': matches, 'frequencies': frequencies, 'cluster': cluster}
+        
+        key = cache_key(data = data, columns = columns, arguments = arguments)
+        cached = cache.get(key)
+        
+        if cached is not None:
+            return cached
     
-    ordered_variables = list_filter(list1 = all_variables, list2 = specified_variables)
+    # Computing the standardized difference with one observation per cluster, aggregating the rows of each cluster in a single pass
     
-    # Computing the standardized difference
+    if cluster != None:
+        
+        assert cluster in list(data), "Cluster variable could not be found in dataframe columns"
+        assert chunksize == None and metrics == [] and terms == [] and permutations == None and matches == None and frequencies == None, "Chunksize, metrics, terms, permutations, matches and frequencies are not supported for clusters"
+        
+        results = compute_clustered(data = data,
+                                    group = group,
+                                    cluster = cluster,
+                                    variables = ordered_variables,
+                                    continuous = continuous,
+                                    skewed = skewed,
+                                    weights = weights,
+                                    decimals = decimals,
+                                    intervals = intervals)
+        
+        results = format_results(results = results, variables = ordered_variables, intervals = intervals)
+        
+        if cache != None:
+            cache.set(key, results)
+        
+        return results
+    
+    # Computing the standardized difference for the matched sample from the matched observations, without repeating them
+    
+    if matches != None or frequencies != None:
+        
+        assert chunksize == None and metrics == [] and terms == [] and permutations == None, "Chunksize, metrics, terms and permutations are not supported for matched samples"
+        
+        cohort = Cohort(data = data, group = group, variables = ordered_variables, continuous = continuous, skewed = skewed)
+        results = cohort.compute(weights = weights, decimals = decimals, intervals = intervals, matches = matches, frequencies = frequencies)
+        
+        if cache != None:
+            cache.set(key, results)
+        
+        return results
+    
+    # Computing the standardized difference (the group codes and weights are extracted once for all sparse variables)
     
     results = []
+    prepared = None
+    
+    if any(isinstance(data[variable].dtype, pandas.SparseDtype) for variable in ordered_variables):
+        prepared = prepare_sparse(data = data, group = group, weights = weights)
     
     for variable in ordered_variables:
+        
+        stdiff = compute_variable(data = data,
+                                  group = group,
+                                  variable = variable,
+                                  continuous = continuous,
+                                  skewed = skewed,
+                                  weights = weights,
+                                  decimals = decimals,
+                                  intervals = intervals,
+                                  chunksize = chunksize,
+                                  metrics = metrics,
+                                  workers = workers,
+                                  prepared = prepared)
+        
+        results.append(stdiff)
+    
+    # Computing the p-values
+    
+    if permutations != None:
+        
+        pvalues = compute_permutations(data = data,
+                                       group = group,
+                                       variables = ordered_variables,
+                                       continuous = continuous,
+                                       skewed = skewed,
+                                       weights = weights,
+                                       permutations = permutations,
+                                       seed = seed,
+                                       workers = workers)
+        
+        results = [(list(stdiff) if type(stdiff) == tuple else [stdiff]) + [pvalue] for stdiff, pvalue in zip(results, pvalues)]
+    
+    # Computing the squares and products of the continuous variables (metrics and p-values are not computed for these)
+    
+    if len(terms) > 0:
+        
+        names, products = compute_products(data = data,
+                                           group = group,
+                                           variables = [variable for variable in ordered_variables if variable in continuous and variable not in skewed],
+                                           weights = weights,
+                                           squares = 'squares' in terms,
+                                           products = 'products' in terms,
+                                           decimals = decimals,
+                                           intervals = intervals)
+        
+        padding = [numpy.nan] * (len(metrics) + (permutations != None))
+        
+        if len(padding) > 0:
+            products = [(list(stdiff) if type(stdiff) == tuple else [stdiff]) + padding for stdiff in products]
+        
+        ordered_variables = ordered_variables + names
+        results = results + products
+    
+    results = format_results(results = results, variables = ordered_variables, intervals = intervals, metrics = metrics, pvalues = permutations != None)
+    
+    if cache != None:
+        cache.set(key, results)
+    
+    return results
 
-        if variable in continuous:
-            
-            if variable in skewed:
-                
-                stdiff = compute_continuous(data = data,
-                                            group = group,
-                                            variable = variable,
-                                            skewed = True,
-                                            weights = weights,
-                                            decimals = decimals,
-                                            intervals = intervals)
-                
-                results.append(stdiff)
-                
-            else:
-                
-                stdiff = compute_continuous(data = data,
-                                            group = group,
-                                            variable = variable,
-                                            skewed = False,
-                                            weights = weights,
-                                            decimals = decimals,
-                                            intervals = intervals)
-                
-                results.append(stdiff)
+#%%
+
+def prepare(data,
+            group,
+            continuous = [],
+            categorical = [],
+            skewed = [],
+            compact = False,
+            downcast = False):
+    
+    """
+    
+    Validates the inputs once and prepares the group codes and variables, so that SDs can be computed repeatedly (e.g. for subsets of the variables, different weights or CIs) without preparing them again
+    
+    Parameters:
+        data (dataframe): Pandas DataFrame containing observations (rows) and variables (columns)
+        group (str): Variable defining the two groups
+        continuous (list): List of string items which are names of the continuous variables for which the SD should be computed
+        categorical (list): List of string items which are names of the categorical variables for which the SD should be computed
+        skewed (list): List of string items which are names of the continuous variables which have a skewed distribution (ranked SD computed)
+        compact (bool): Whether the variables are stored in narrow types (integer values in the narrowest integer type, float32 values and weights kept as float32, uint16 category codes) to reduce memory use, with sums computed in float64 in blocks of rows
+        downcast (bool): Whether float64 values and weights are also stored as float32 if compact (rounding them to about 7 significant digits)
+    
+    Returns:
+        Cohort whose compute() method computes the SDs
+
+    """
+    
+    assert type(data) == pandas.DataFrame, "Data must be specified as a Pandas DataFrame"
+    assert type(compact) == bool, "Compact must be specified as a boolean"
+    assert type(downcast) == bool, "Downcast must be specified as a boolean"
+    
+    ordered_variables = check_inputs(data = data,
+                                     group = group,
+                                     continuous = continuous,
+                                     categorical = categorical,
+                                     skewed = skewed)
+    
+    return Cohort(data = data,
+                  group = group,
+                  variables = ordered_variables,
+                  continuous = continuous,
+                  skewed = skewed,
+                  compact = compact,
+                  downcast = downcast)
+
+#%%
+
+def compute_windows(data,
+                    group,
+                    time,
+                    continuous = [],
+                    categorical = [],
+                    weights = None,
+                    window = 90,
+                    decimals = 2):
+    
+    """
+    
+    Computes SDs for all specified variables in a window of days which moves forward one day at a time, e.g. to monitor balance in a registry
+    
+    Parameters:
+        data (dataframe): Pandas DataFrame containing observations (rows) and variables (columns)
+        group (str): Variable defining the two groups
+        time (str): Variable defining the timestamp (or date) of each observation
+        continuous (list): List of string items which are names of the continuous variables for which the SD should be computed
+        categorical (list): List of string items which are names of the categorical variables for which the SD should be computed
+        weights (None or str): Variable defining weights for each observation (otherwise assumed to be equally weighted)
+        window (int): Number of days in each window
+        decimals (int): Number of decimal places which should be computed
+    
+    Returns:
+        Pandas DataFrame containing the computed SDs, with one row per window (indexed by its last day) and one column per variable
+
+    """
+    
+    assert type(data) == pandas.DataFrame, "Data must be specified as a Pandas DataFrame"
+    assert type(time) == str and time in list(data), "Time variable must be specified as a string and found in dataframe columns"
+    assert type(window) == int and window > 0, "Window must be specified as a positive integer number of days"
+    
+    ordered_variables = check_inputs(data = data,
+                                     group = group,
+                                     continuous = continuous,
+                                     categorical = categorical,
+                                     weights = weights,
+                                     decimals = decimals)
+    
+    days, results = compute_windowed(data = data,
+                                     group = group,
+                                     time = time,
+                                     variables = ordered_variables,
+                                     continuous = continuous,
+                                     weights = weights,
+                                     window = window,
+                                     decimals = decimals)
+    
+    return pandas.DataFrame(data = results, index = pandas.Index(days, name = time), columns = ordered_variables)
+
+#%%
+
+def screen(data,
+           group,
+           variables = None,
+           weights = None,
+           top = 100,
+           blocksize = 1000,
+           decimals = 2):
+    
+    """
+    
+    Computes SDs for a wide set of covariates in blocks of columns and returns only the most imbalanced
+    Columns which only take the values 0 and 1 are treated as binary categorical variables, all others as continuous
+    
+    Parameters:
+        data (dataframe, array or sparse matrix): Pandas DataFrame, Numpy array or scipy.sparse matrix (e.g. CSR) containing observations (rows) and variables (columns)
+        group (str or array): Variable defining the two groups (if data is a DataFrame) or array of group values (otherwise)
+        variables (None or list): Names of the variables to be screened (if data is a DataFrame) or names of the columns (otherwise); by default all columns are screened
+        weights (None, str or array): Variable or array defining weights for each observation (otherwise assumed to be equally weighted)
+        top (int): Number of variables with the largest absolute SD which should be returned
+        blocksize (int): Number of columns which are computed in each vectorized pass
+        decimals (int): Number of decimal places which should be computed
+    
+    Returns:
+        Pandas DataFrame containing the computed SDs for the top variables, sorted by absolute SD
+
+    """
+    
+    # Asserting input types
+    
+    assert type(top) == int and top > 0, "Number of variables returned must be specified as a positive integer"
+    assert type(blocksize) == int and blocksize > 0, "Block size must be specified as a positive integer"
+    assert type(decimals) == int, "Number of decimal places must be specified as an integer"
+    
+    if isinstance(data, pandas.DataFrame):
+        
+        assert type(group) == str, "Group variable must be specified as a string"
+        assert weights == None or type(weights) == str, "If weight variable is present, it must be specified as a string"
+        
+        if variables == None:
+            variables = [variable for variable in list(data) if variable not in [group, weights]]
+        
+        codes = compute_codes(data[group])
+        wgts = None if weights == None else data[weights].to_numpy(dtype = numpy.float64)
+        columns = len(variables)
+        
+    else:
+        
+        assert data.ndim == 2, "Data must be specified as a 2-D array or sparse matrix"
+        
+        if variables == None:
+            variables = list(range(data.shape[1]))
+        
+        assert len(variables) == data.shape[1], "Number of variable names must match the number of columns"
         
+        codes = compute_codes(group)
+        wgts = None if weights is None else numpy.asarray(weights, dtype = numpy.float64)
+        columns = data.shape[1]
+    
+    # Computing the SDs block by block, only keeping the current top variables
+    
+    best_index = numpy.empty(shape = 0, dtype = numpy.int64)
+    best_stdiff = numpy.empty(shape = 0)
+    
+    for start in range(0, columns, blocksize):
+        
+        stop = min(start + blocksize, columns)
+        
+        if isinstance(data, pandas.DataFrame):
+            block = data[variables[start:stop]].to_numpy(dtype = numpy.float64)
         else:
+            block = data[:, start:stop]
+        
+        stdiff = compute_screening(block = block, codes = codes, weights = wgts)
+        
+        best_index = numpy.concatenate((best_index, numpy.arange(start, stop)))
+        best_stdiff = numpy.concatenate((best_stdiff, stdiff))
+        
+        if len(best_index) > top:
+            
+            keep = numpy.argpartition(-numpy.nan_to_num(numpy.abs(best_stdiff), nan = -1), top - 1)[:top]
+            best_index = best_index[keep]
+            best_stdiff = best_stdiff[keep]
+    
+    order = numpy.argsort(-numpy.nan_to_num(numpy.abs(best_stdiff), nan = -1), kind = 'stable')
+    
+    results = pandas.DataFrame(data = best_stdiff[order].round(decimals),
+                               index = [variables[i] for i in best_index[order]],
+                               columns = ['ES'])
+    
+    return results
+
+#%%
+
+async def compute_stream(data,
+                         group,
+                         continuous = [],
+                         categorical = [],
+                         skewed = [],
+                         weights = None,
+                         decimals = 2,
+                         intervals = None,
+                         chunksize = None,
+                         metrics = [],
+                         executor = None):
+    
+    """
+    
+    Computes SDs for all specified variables without blocking the event loop, yielding each SD as soon as it has been computed
+    Each variable is computed in the executor; if the stream is closed or cancelled, the variables which have not started are cancelled
+    
+    Parameters:
+        As for compute() (only data, group, continuous, categorical, skewed, weights, decimals, intervals, chunksize and metrics), and:
+        executor (None or executor): concurrent.futures executor in which the variables are computed (otherwise the event loop's default executor)
+    
+    Yields:
+        Tuples in the format: (variable, computed SD or list containing SD and CI, if requested)
+
+    """
+    
+    ordered_variables = check_inputs(data = data,
+                                     group = group,
+                                     continuous = continuous,
+                                     categorical = categorical,
+                                     skewed = skewed,
+                                     weights = weights,
+                                     decimals = decimals,
+                                     intervals = intervals,
+                                     chunksize = chunksize,
+                                     metrics = metrics)
+    
+    loop = asyncio.get_running_loop()
+    
+    futures = {}
+    
+    for variable in ordered_variables:
+        
+        task = functools.partial(compute_variable,
+                                 data = data,
+                                 group = group,
+                                 variable = variable,
+                                 continuous = continuous,
+                                 skewed = skewed,
+                                 weights = weights,
+                                 decimals = decimals,
+                                 intervals = intervals,
+                                 chunksize = chunksize,
+                                 metrics = metrics)
+        
+        futures[loop.run_in_executor(executor, task)] = variable
+    
+    pending = set(futures)
+    
+    try:
+        
+        while pending:
             
-            stdiff = compute_categorical(data = data,
-                                         group = group, 
-                                         variable = variable,
-                                         weights = weights,
-                                         decimals = decimals,
-                                         intervals = intervals)
+            done, pending = await asyncio.wait(pending, return_when = asyncio.FIRST_COMPLETED)
             
-            results.append(stdiff)
+            for future in done:
+                yield futures[future], future.result()
+    
+    finally:
+        
+        for future in pending:
+            future.cancel()
+
+#%%
+
+async def compute_async(data,
+                        group,
+                        continuous = [],
+                        categorical = [],
+                        skewed = [],
+                        weights = None,
+                        decimals = 2,
+                        intervals = None,
+                        chunksize = None,
+                        metrics = [],
+                        executor = None,
+                        timeout = None):
+    
+    """
     
-    results = pandas.DataFrame(data = results)
-    results.set_axis([ordered_variables], axis = 0, inplace = True)
+    Computes SDs for all specified variables without blocking the event loop
     
-    # Computing the CIs
+    Parameters:
+        As for compute() (only data, group, continuous, categorical, skewed, weights, decimals, intervals, chunksize and metrics), and:
+        executor (None or executor): concurrent.futures executor in which the variables are computed (otherwise the event loop's default executor)
+        timeout (None or float): Number of seconds after which the computation is cancelled and asyncio.TimeoutError is raised
     
-    if intervals == None:
+    Returns:
+        Pandas DataFrame containing the computed SDs (and CIs, if specified), as for compute()
+
+    """
+    
+    assert timeout == None or timeout > 0, "Timeout must be specified as None or a positive number of seconds"
+    
+    async def collect():
+        
+        results = {}
+        
+        async for variable, stdiff in compute_stream(data = data,
+                                                     group = group,
+                                                     continuous = continuous,
+                                                     categorical = categorical,
+                                                     skewed = skewed,
+                                                     weights = weights,
+                                                     decimals = decimals,
+                                                     intervals = intervals,
+                                                     chunksize = chunksize,
+                                                     metrics = metrics,
+                                                     executor = executor):
+            results[variable] = stdiff
         
-        results.set_axis(['ES'], axis = 1, inplace = True)
+        return results
     
-    else:
+    results = await asyncio.wait_for(collect(), timeout = timeout)
+    ordered_variables = list_filter(list1 = list(data), list2 = list(results))
+    
+    return format_results(results = [results[variable] for variable in ordered_variables], variables = ordered_variables, intervals = intervals, metrics = metrics)
+
+#%%
+
+def compute_pooled(data,
+                   group,
+                   imputation,
+                   continuous = [],
+                   categorical = [],
+                   skewed = [],
+                   weights = None,
+                   decimals = 2,
+                   intervals = None):
+    
+    """
+    
+    Computes SDs pooled across multiply imputed datasets, stacked in long format
+    The SD is computed in each imputed dataset and averaged, CIs are constructed using Rubin's rules
+    
+    Parameters:
+        As for compute(), and:
+        imputation (str): Variable defining the imputed dataset to which each observation belongs
+    
+    Returns:
+        Pandas DataFrame containing the pooled SDs (and CIs, if specified)
+
+    """
+    
+    assert type(imputation) == str, "Imputation variable must be specified as a string"
+    
+    ordered_variables = check_inputs(data = data,
+                                     group = group,
+                                     continuous = continuous,
+                                     categorical = categorical,
+                                     skewed = skewed,
+                                     weights = weights,
+                                     decimals = decimals,
+                                     intervals = intervals)
+    
+    # Computing the standardized difference in each imputed dataset and pooling
+    
+    results = []
+    
+    for variable in ordered_variables:
+        
+        stdiffs, n0, n1 = compute_imputed(data = data,
+                                          group = group,
+                                          imputation = imputation,
+                                          variable = variable,
+                                          continuous = variable in continuous,
+                                          skewed = variable in skewed,
+                                          weights = weights)
+        
+        stdiff = pool_stdiff(stdiffs = stdiffs, n0 = n0, n1 = n1, decimals = decimals, intervals = intervals)
         
-        ci_label = round(( intervals * 100 ), ndigits = 2)
-        results.set_axis(['ES', str(ci_label) + '% CI'], axis = 1, inplace = True)     
+        results.append(stdiff)
     
-    return results
\ No newline at end of file
+    return format_results(results = results, variables = ordered_variables, intervals = intervals)
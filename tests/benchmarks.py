@@ -0,0 +1,56 @@
+# Benchmarking effectsize.compute() and prepared cohorts
+
+import time
+import tracemalloc
+import numpy
+import pandas
+import effectsize
+
+#%% Simulating a large cohort, with float32 measurements and int8 indicators
+
+rows = 500000
+generator = numpy.random.default_rng(seed = 42)
+
+df = pandas.DataFrame({"group": generator.integers(0, 2, size = rows).astype(numpy.int8),
+                       "wgt": generator.uniform(0.5, 2.0, size = rows).astype(numpy.float32)})
+
+for i in range(10):
+    df["cont" + str(i)] = generator.normal(loc = 0.1 * i, scale = 1.0, size = rows).astype(numpy.float32)
+    df["ind" + str(i)] = generator.integers(0, 2, size = rows).astype(numpy.int8)
+
+df["cat"] = generator.integers(0, 50, size = rows).astype(numpy.int16)
+
+continuous = ["cont" + str(i) for i in range(10)] + ["ind" + str(i) for i in range(10)]
+categorical = ["cat"]
+
+#%% Peak memory (in addition to the data) and time of each computation
+
+def benchmark(label, function):
+    
+    tracemalloc.start()
+    start = time.perf_counter()
+    
+    results = function()
+    
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    
+    print(label + ": peak memory " + str(round(peak / 1024 ** 2, 1)) + " MB, " + str(round(elapsed, 2)) + " seconds")
+    
+    return results, peak
+
+def prepared(compact):
+    
+    cohort = effectsize.prepare(data = df, group = "group", continuous = continuous, categorical = categorical, compact = compact)
+    
+    return cohort.compute(weights = "wgt")
+
+results_compute, peak_compute = benchmark("compute()", lambda: effectsize.compute(data = df, group = "group", continuous = continuous, categorical = categorical, weights = "wgt"))
+results_prepared, peak_prepared = benchmark("prepare()", lambda: prepared(compact = False))
+results_compact, peak_compact = benchmark("prepare(compact = True)", lambda: prepared(compact = True))
+
+print("Peak memory reduction of compact mode: " + str(round(peak_prepared / peak_compact, 1)) + "x versus prepare(), " + str(round(peak_compute / peak_compact, 1)) + "x versus compute()")
+
+## Should be the same
+print((results_compute - results_compact).abs().max())
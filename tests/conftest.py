@@ -0,0 +1,71 @@
+import os
+import sys
+import numpy
+import pandas
+import pytest
+
+# The modules are imported from the src directory (rather than the copy of functions.py in this directory), as set by pythonpath and the importlib import mode in pyproject.toml
+# The path is also added here, for pytest versions without the pythonpath option
+
+directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(directory), "src"))
+
+#%%
+
+@pytest.fixture(scope = "session")
+def simulated():
+    
+    # Simulated data, as in simulating_data.py
+    
+    namespace = {}
+    exec(open(os.path.join(directory, "simulating_data.py")).read(), namespace)
+    
+    return namespace["df"]
+
+@pytest.fixture
+def df(simulated):
+    
+    return simulated.copy()
+
+#%%
+
+@pytest.fixture
+def make_data():
+    
+    def make(seed,
+             rows = 500,
+             missing = 0.05):
+        
+        """
+        
+        Simulates data with a shift between the groups and missing values in every column
+        
+        Parameters:
+            seed (int): Seed for the random number generator
+            rows (int): Number of observations
+            missing (float): Proportion of missing values in each column
+        
+        Returns:
+            Pandas DataFrame containing the group, weights, continuous (normal, exponential and tied integer) and categorical (2 and 4 levels) variables
+        
+        """
+        
+        generator = numpy.random.default_rng(seed = seed)
+        group = generator.integers(0, 2, size = rows)
+        
+        data = pandas.DataFrame({"group": group.astype(numpy.float64),
+                                 "wgt": generator.uniform(0.5, 2.0, size = rows),
+                                 "normal": generator.normal(loc = 0.3 * group, scale = 1.0 + 0.5 * group),
+                                 "exponential": generator.exponential(scale = 1.0 + 0.5 * group),
+                                 "integer": generator.integers(0, 5, size = rows) + group * generator.integers(0, 2, size = rows),
+                                 "binary": generator.binomial(n = 1, p = 0.3 + 0.2 * group).astype(numpy.float64),
+                                 "levels": generator.choice(["a", "b", "c", "d"], size = rows)})
+        
+        data["integer"] = data["integer"].astype(numpy.float64)
+        
+        for column in data:
+            data.loc[generator.random(size = rows) < missing, column] = numpy.nan
+        
+        return data
+    
+    return make
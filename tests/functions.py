@@ -1,5 +1,9 @@
+import os
+import tempfile
+import concurrent.futures
 import numpy
 import scipy
+import scipy.sparse
 import pandas
 from statsmodels.stats.weightstats import DescrStatsW
 # Note that in the function documentation the term standardized difference (SD) is preferred over effect size; both terms have the same meaning
@@ -66,24 +70,48 @@ def compute_intervals(data,
         
     if weights == None:
         
-        # Number of observations in group 1, group 0, and total
+        # Number of observations in group 1 and group 0
     
         n0 = data.groupby(group).size()[0]
         n1 = data.groupby(group).size()[1]
     
-        total = n0 + n1
-    
     else:
         
-        # Sum of weights in group 1, group 0, and total
+        # Sum of weights in group 1 and group 0
         
         data = data.dropna(axis = 0, subset = [weights])
     
         n0 = data.groupby(group)[weights].sum()[0]
         n1 = data.groupby(group)[weights].sum()[1]
+        
+    return compute_bounds(stdiff = stdiff, n0 = n0, n1 = n1, decimals = decimals, coverage = coverage)
+
+#%%
+
+def compute_bounds(stdiff,
+                   n0,
+                   n1,
+                   decimals = 2,
+                   coverage = 0.95):
+        
+    """
+    
+    Constructs two-sided confidence intervals for SDs from the size (or sum of weights) of each group
+       
+    Parameters:
+        stdiff (float): The SD between exposed and unexposed for the given covariate
+        n0 (float): Number of observations (or sum of weights) in group 0
+        n1 (float): Number of observations (or sum of weights) in group 1
+        decimals (int): Number of decimal places which should be computed
+        coverage (float): Value in range (0,1) specfiying coverage of confidence interval e.g. for 95% CI, intervals = 0.95
     
-        total = n0 + n1
+    Returns:
+        List in the format: [upper CI, lower CI] 
         
+    """
+    
+    total = n0 + n1
+    
     # Computing the corresponding value from the standard Normal for specified CI coverage
     
     percentile = 1 - ((1 - coverage) / 2)
@@ -98,8 +126,8 @@ def compute_intervals(data,
     lower_ci = stdiff - zscore * deviation
     upper_ci = stdiff + zscore * deviation
         
-    lower_ci = lower_ci.round(decimals)
-    upper_ci = upper_ci.round(decimals)
+    lower_ci = numpy.round(lower_ci, decimals)
+    upper_ci = numpy.round(upper_ci, decimals)
     
     return [lower_ci, upper_ci]
 
@@ -174,7 +202,11 @@ def compute_continuous(data,
                        skewed = False, 
                        weights = None,
                        decimals = 2,
-                       intervals = None):
+                       intervals = None,
+                       chunksize = None,
+                       metrics = [],
+                       workers = None,
+                       prepared = None):
     
     """
     
@@ -188,23 +220,64 @@ def compute_continuous(data,
         weights (None or str): Variable defining weights for each observation (otherwise assumed to be equally weighted)
         decimals (int): Number of decimal places which should be computed
         intervals (None or float): Whether CIs should be computed and with what coverage e.g. for 95% CI, intervals = 0.95
+        chunksize (None or int): For skewed variables, number of observations ranked in memory at once (otherwise the whole variable is ranked in memory)
+        metrics (list): Distributional balance metrics which should be computed, out of 'variance' (variance ratio), 'ks' (Kolmogorov-Smirnov statistic) and 'ecdf' (mean eCDF difference)
+        workers (None or int): Number of threads across which blocks of rows are computed (otherwise all rows are computed at once)
+        prepared (None or list): Group codes, weights and sums of weights as returned by prepare_sparse(), shared by all sparse variables (otherwise extracted from the data)
     
     Returns:
-        Computed SD or list containing SD and CI, if requested
+        Computed SD or list containing SD and CI (and metrics), if requested
         
     """
-           
-    if weights == None:
+    
+    # Sparse variables are computed from their stored entries only (ranking requires the dense variable)
+    
+    sparse = isinstance(data[variable].dtype, pandas.SparseDtype)
+    
+    # Sorting the variable once, both for the ranks of skewed variables and for the eCDF metrics
+    
+    sort = (skewed and chunksize == None) or 'ks' in metrics or 'ecdf' in metrics
+    
+    # The columns are not copied for sparse variables, so that the time taken depends on the number of stored entries
+    
+    if sparse and not sort:
+        subset = data
+    elif weights == None:
         subset = data[[group, variable]]
     else:
         subset = data[[group, variable, weights]]
-              
-    if skewed == False:
+    
+    if sort:
+        
+        if sparse:
+            subset = subset.assign(**{variable: subset[variable].sparse.to_dense()})
+            sparse = False
+        
+        wgts = None if weights == None else subset[weights].to_numpy(dtype = numpy.float64)
+        ranks, distances = compute_distribution(values = subset[variable].to_numpy(dtype = numpy.float64), codes = compute_codes(subset[group]), weights = wgts)
+    
+    # Blocks of rows are computed across threads and their sufficient statistics merged
+    
+    blocked = workers != None and not sparse and (skewed == False or sort)
+    
+    if blocked:
+        wgts = None if weights == None else subset[weights].to_numpy(dtype = numpy.float64)
+        values = ranks if skewed else subset[variable].to_numpy(dtype = numpy.float64)
+        moments = compute_blocked_moments(values = values, codes = compute_codes(subset[group]), weights = wgts, workers = workers)
+        results = summarize_moments(moments = moments)
+    elif sparse and skewed == False:
+        moments = compute_sparse(data = subset, group = group, variable = variable, weights = weights, prepared = prepared)
+        results = summarize_moments(moments = moments)
+    elif skewed == False:
         results = compute_means(data = subset, group = group, variable = variable, weights = weights)
-    else:
-        ranks = subset[variable].rank(axis = 0, method = 'average', na_option = 'keep', ascending = True)
+    elif sort:
         subset = subset.assign(ranks = ranks)
         results = compute_means(data = subset, group = group, variable = 'ranks', weights = weights)
+    else:
+        wgts = None if weights == None else subset[weights].to_numpy(dtype = numpy.float64)
+        moments = compute_ranked(values = subset[variable].to_numpy(dtype = numpy.float64), codes = compute_codes(subset[group]),
+                                 weights = wgts, chunksize = chunksize)
+        results = summarize_moments(moments = moments)
     
     mean0 = results[0]
     mean1 = results[1]
@@ -216,19 +289,101 @@ def compute_continuous(data,
     stdiff = (mean1 - mean0) / numpy.sqrt((variance0 + variance1) / 2) 
     stdiff = stdiff.round(decimals)   
     
+    row = [stdiff]
+    
     # Computing the CIs
     
     if intervals == None:
         
-        return stdiff
+        pass
+    
+    elif blocked or (sparse and skewed == False):
+        
+        ci = compute_bounds(stdiff = stdiff, n0 = moments[0][0], n1 = moments[0][1], decimals = decimals, coverage = intervals)
+        row.append(ci)
     
     else:
         
         ci = compute_intervals(data = data, group = group, variable = variable, stdiff = stdiff,
                                weights = weights, decimals = decimals, coverage = intervals)
+        row.append(ci)
+    
+    # Computing the distributional metrics (the variance ratio is computed on the values, not the ranks)
+    
+    for metric in metrics:
         
-        return stdiff, ci
+        if metric == 'variance':
+            
+            if skewed and sparse:
+                variances = summarize_moments(moments = compute_sparse(data = subset, group = group, variable = variable, weights = weights, prepared = prepared))[2:]
+            elif skewed:
+                variances = compute_means(data = subset, group = group, variable = variable, weights = weights)[2:]
+            else:
+                variances = [variance0, variance1]
+            
+            row.append(numpy.round(variances[1] / variances[0], decimals))
+        
+        else:
+            
+            row.append(numpy.round(distances[metric], decimals))
+    
+    if len(row) == 1:
+        
+        return stdiff
+    
+    else:
+        
+        return tuple(row)
+    
+#%%
+
+def compute_distribution(values,
+                         codes,
+                         weights = None):
+    
+    """
+    
+    Sorts a variable once to compute its (average) ranks and the distances between the eCDFs of the two groups
+       
+    Parameters:
+        values (array): Numpy array of values of the variable
+        codes (array): Group codes as returned by compute_codes()
+        weights (None or array): Weights for each observation (otherwise assumed to be equally weighted)
+    
+    Returns:
+        Numpy array of ranks as in Series.rank(method = 'average') (missing values have missing ranks) and dictionary in the format: {'ks': maximum eCDF difference, 'ecdf': mean eCDF difference}
+        
+    """
+    
+    if weights is None:
+        weights = numpy.ones(shape = len(values))
     
+    # Missing values are sorted last, ties are the runs of equal sorted values
+    
+    count = int((~numpy.isnan(values)).sum())
+    order = numpy.argsort(values, kind = 'stable')[:count]
+    ordered = values[order]
+    
+    starts = numpy.concatenate(([0], numpy.flatnonzero(ordered[1:] != ordered[:-1]) + 1))
+    ends = numpy.concatenate((starts[1:], [count]))
+    
+    ranks = numpy.full(shape = len(values), fill_value = numpy.nan)
+    ranks[order] = numpy.repeat((starts + ends + 1) / 2, ends - starts)
+    
+    # Weighted eCDF of each group at each distinct value, excluding observations with missing group or weight
+    
+    grps = codes[order]
+    wgts = numpy.nan_to_num(weights[order], nan = 0.0)
+    
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        
+        ecdf0 = numpy.cumsum(numpy.where(grps == 0, wgts, 0))
+        ecdf1 = numpy.cumsum(numpy.where(grps == 1, wgts, 0))
+        
+        difference = numpy.abs(ecdf1[ends - 1] / ecdf1[-1] - ecdf0[ends - 1] / ecdf0[-1])
+    
+    return ranks, {'ks': difference.max(), 'ecdf': difference.mean()}
+
 #%%
 
 def compute_categorical(data,
@@ -236,7 +391,9 @@ def compute_categorical(data,
                         variable,
                         weights = None,
                         decimals = 2,
-                        intervals = None):
+                        intervals = None,
+                        workers = None,
+                        prepared = None):
     
     """
     
@@ -249,12 +406,61 @@ def compute_categorical(data,
         weights (None or str): Variable defining weights for each observation (otherwise assumed to be equally weighted)
         decimals (int): Number of decimal places which should be computed
         intervals (None or float): Whether CIs should be computed and with what coverage e.g. for 95% CI, intervals = 0.95
+        workers (None or int): Number of threads across which blocks of rows are computed (otherwise all rows are computed at once)
+        prepared (None or list): Group codes, weights and sums of weights as returned by prepare_sparse(), shared by all sparse variables (otherwise extracted from the data)
     
     Returns:
         Computed SD or list containing SD and CI, if requested
     
     """
     
+    if isinstance(data[variable].dtype, pandas.SparseDtype):
+        
+        # Binary sparse variables are computed from their stored entries only, otherwise the variable is made dense
+        
+        column = data[variable].array
+        levels = pandas.unique(column.sp_values[~numpy.isnan(column.sp_values)])
+        levels = [level for level in levels if level != column.fill_value]
+        
+        if len(levels) + (not pandas.isna(column.fill_value)) <= 2:
+            
+            moments = compute_sparse(data = data, group = group, variable = variable, weights = weights, binary = True, prepared = prepared)
+            stdiff = compute_stdiff(moments = moments, binary = True).round(decimals)
+            
+            if intervals == None:
+                
+                return stdiff
+            
+            else:
+                
+                ci = compute_bounds(stdiff = stdiff, n0 = moments[0][0], n1 = moments[0][1], decimals = decimals, coverage = intervals)
+                
+                return stdiff, ci
+        
+        columns = [group, variable] if weights == None else [group, variable, weights]
+        data = data[columns].assign(**{variable: data[variable].sparse.to_dense()})
+    
+    if workers != None:
+        
+        # Computing the weighted table of levels by group in blocks of rows across threads
+        
+        wgts = None if weights == None else data[weights].to_numpy(dtype = numpy.float64)
+        table = compute_blocked_table(categories = pandas.factorize(data[variable], sort = True)[0], codes = compute_codes(data[group]),
+                                      weights = wgts, workers = workers)
+        
+        total = table.sum(axis = 1)
+        stdiff = compute_mahalanobis(prob0 = table[None, 0] / total[0], prob1 = table[None, 1] / total[1])[0].round(decimals)
+        
+        if intervals == None:
+            
+            return stdiff
+        
+        else:
+            
+            ci = compute_bounds(stdiff = stdiff, n0 = total[0], n1 = total[1], decimals = decimals, coverage = intervals)
+            
+            return stdiff, ci
+    
     data = data.dropna(axis = 0, subset = [group, variable])    
     
     if weights == None:
@@ -328,4 +534,1708 @@ def compute_categorical(data,
         ci = compute_intervals(data = data, group = group, variable = variable, stdiff = stdiff, 
                                weights = weights, decimals = decimals, coverage = intervals)
         
-        return stdiff, ci
\ No newline at end of file
+        return stdiff, ci
+#%%
+
+def compute_codes(values):
+    
+    """
+    
+    Factorizes the group variable into integer codes (0 and 1, in sorted order of the group values)
+       
+    Parameters:
+        values (array): Values of the variable defining the two groups
+    
+    Returns:
+        Numpy array of int8 codes, where missing values are coded as -1
+        
+    """
+    
+    codes, levels = pandas.factorize(numpy.asarray(values), sort = True)
+    
+    assert len(levels) == 2, "Group variable must define exactly two groups"
+    
+    return codes.astype(numpy.int8)
+
+#%%
+
+def compute_moments(values,
+                    codes,
+                    weights = None):
+    
+    """
+    
+    Computes the sufficient statistics for continuous variables, conditional on group
+    Missing values are excluded column by column
+       
+    Parameters:
+        values (array): Numpy array of values, either a single variable (1-D) or one variable per column (2-D)
+        codes (array): Group codes as returned by compute_codes()
+        weights (None or array): Weights for each observation (otherwise assumed to be equally weighted)
+    
+    Returns:
+        Numpy array in the format: [sum of weights, mean, sum of squared deviations], each row having one entry per group (and per variable, if 2-D)
+        
+    """
+    
+    values = numpy.asarray(values, dtype = numpy.float64)
+    
+    if weights is None:
+        weights = numpy.ones(shape = len(codes))
+    else:
+        weights = numpy.asarray(weights, dtype = numpy.float64)
+    
+    moments = []
+    
+    for level in [0, 1]:
+        
+        rows = (codes == level)
+        vals = values[rows]
+        wgts = weights[rows]
+        
+        if vals.ndim == 2:
+            wgts = wgts[:, None]
+        
+        # Zero weight for missing values, so that they drop out of every sum
+        
+        missing = numpy.isnan(vals) | numpy.isnan(wgts)
+        wgts = numpy.where(missing, 0, wgts)
+        vals = numpy.where(missing, 0, vals)
+        
+        total = wgts.sum(axis = 0)
+        
+        with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+            mean = (wgts * vals).sum(axis = 0) / total
+        
+        deviation = (wgts * (vals - mean) ** 2).sum(axis = 0)
+        deviation = numpy.where(total > 0, deviation, 0)
+        
+        moments.append([total, mean, deviation])
+    
+    return numpy.stack([numpy.stack([moments[0][i], moments[1][i]]) for i in range(3)])
+
+#%%
+
+def compute_sparse_moments(matrix,
+                           codes,
+                           weights = None):
+    
+    """
+    
+    Computes the sufficient statistics for the columns of a scipy.sparse matrix, conditional on group
+    Only the stored entries are visited, all other entries are zeros
+       
+    Parameters:
+        matrix (sparse matrix): scipy.sparse matrix containing observations (rows) and variables (columns)
+        codes (array): Group codes as returned by compute_codes()
+        weights (None or array): Weights for each observation (otherwise assumed to be equally weighted)
+    
+    Returns:
+        Numpy array in the same format as compute_moments()
+        
+    """
+    
+    if weights is None:
+        weights = numpy.ones(shape = len(codes))
+    else:
+        weights = numpy.nan_to_num(numpy.asarray(weights, dtype = numpy.float64), nan = 0.0)
+    
+    entries = scipy.sparse.coo_matrix(matrix)
+    entries.sum_duplicates()
+    
+    # Stored entries of the observations with a group, indexed by column and group
+    
+    rows = codes[entries.row] >= 0
+    cells = entries.col[rows] * 2 + codes[entries.row[rows]]
+    vals = entries.data[rows]
+    wgts = weights[entries.row[rows]]
+    size = 2 * matrix.shape[1]
+    
+    total = numpy.array([weights[codes == 0].sum(), weights[codes == 1].sum()])[:, None]
+    stored = numpy.bincount(cells, weights = wgts, minlength = size).reshape(-1, 2).T
+    
+    # Weight of the implicit entries, which is exactly zero if every observation is stored
+    
+    implicit = numpy.array([(codes == 0).sum(), (codes == 1).sum()])[:, None] - numpy.bincount(cells, minlength = size).reshape(-1, 2).T
+    implicit = numpy.where(implicit > 0, total - stored, 0)
+    
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        mean = numpy.bincount(cells, weights = wgts * vals, minlength = size).reshape(-1, 2).T / total
+    
+    # Sum of squared deviations from the mean, over the stored entries and the (zero) implicit entries
+    
+    deviation = numpy.bincount(cells, weights = wgts * (vals - mean.T.ravel()[cells]) ** 2, minlength = size).reshape(-1, 2).T
+    deviation = deviation + implicit * mean ** 2
+    
+    return numpy.stack([numpy.broadcast_to(total, mean.shape), mean, deviation])
+
+#%%
+
+def combine_moments(first,
+                    second):
+    
+    """
+    
+    Combines two sets of sufficient statistics computed on disjoint sets of observations (Chan et al. pairwise update)
+       
+    Parameters:
+        first (array): Sufficient statistics as returned by compute_moments()
+        second (array): Sufficient statistics as returned by compute_moments()
+    
+    Returns:
+        Numpy array in the same format as compute_moments()
+        
+    """
+    
+    total = first[0] + second[0]
+    delta = second[1] - first[1]
+    
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        share = numpy.where(total > 0, second[0] / total, 0)
+    
+    delta = numpy.where((first[0] > 0) & (second[0] > 0), delta, 0)
+    mean = numpy.where(first[0] > 0, first[1] + delta * share, second[1])
+    deviation = first[2] + second[2] + delta ** 2 * first[0] * share
+    
+    return numpy.stack([total, mean, deviation])
+
+#%%
+
+def summarize_moments(moments):
+    
+    """
+    
+    Computes mean and variance from sufficient statistics, in the same format as compute_means()
+       
+    Parameters:
+        moments (array): Sufficient statistics for a single variable as returned by compute_moments()
+    
+    Returns:
+        List in the format: [group 0 mean, group 1 mean, group 0 variance, group 1 variance]
+        
+    """
+    
+    variance = moments[2] / (moments[0] - 1)
+    
+    return [moments[1][0], moments[1][1], variance[0], variance[1]]
+
+#%%
+
+def compute_stdiff(moments,
+                   binary = False):
+    
+    """
+    
+    Computes SDs from sufficient statistics
+       
+    Parameters:
+        moments (array): Sufficient statistics as returned by compute_moments()
+        binary (bool or array): Whether the variables are binary (0/1) indicators, in which case the SD of the categorical variable is computed
+    
+    Returns:
+        SD (unrounded) for each variable
+        
+    """
+    
+    total, mean, deviation = moments[0], moments[1], moments[2]
+    
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        
+        variance = deviation / (total - 1)
+        stdiff = (mean[1] - mean[0]) / numpy.sqrt((variance[0] + variance[1]) / 2)
+        
+        # For binary indicators the variance is p(1 - p) and the SD is unsigned, as in compute_categorical()
+        
+        proportion = mean * (1 - mean)
+        indicator = numpy.abs(mean[1] - mean[0]) / numpy.sqrt((proportion[0] + proportion[1]) / 2)
+    
+    return numpy.where(binary, indicator, stdiff)[()]
+
+#%%
+
+def compute_screening(block,
+                      codes,
+                      weights = None):
+    
+    """
+    
+    Computes SDs for a block of columns in a single vectorized pass
+    Columns which only take the values 0 and 1 are treated as binary categorical variables, all others as continuous
+       
+    Parameters:
+        block (array or sparse matrix): Numpy array or scipy.sparse matrix containing observations (rows) and variables (columns)
+        codes (array): Group codes as returned by compute_codes()
+        weights (None or array): Weights for each observation (otherwise assumed to be equally weighted)
+    
+    Returns:
+        Numpy array containing the SD (unrounded) for each column
+        
+    """
+    
+    if scipy.sparse.issparse(block):
+        
+        moments = compute_sparse_moments(matrix = block, codes = codes, weights = weights)
+        
+        entries = block.tocoo()
+        nonbinary = (entries.data != 0) & (entries.data != 1)
+        binary = numpy.bincount(entries.col[nonbinary], minlength = block.shape[1]) == 0
+        
+    else:
+        
+        block = numpy.asarray(block, dtype = numpy.float64)
+        moments = compute_moments(values = block, codes = codes, weights = weights)
+        
+        binary = numpy.all((block == 0) | (block == 1) | numpy.isnan(block), axis = 0)
+    
+    return compute_stdiff(moments = moments, binary = binary)
+
+#%%
+
+def prepare_sparse(data,
+                   group,
+                   weights = None):
+    
+    """
+    
+    Extracts the group codes and weights once for all sparse variables, so that each sparse variable only visits its stored entries
+       
+    Parameters:
+        data (dataframe): Pandas DataFrame containing observations (rows) and variables (columns)
+        group (str): Variable defining the two groups
+        weights (None or str): Variable defining weights for each observation (otherwise assumed to be equally weighted)
+    
+    Returns:
+        List in the format: [group codes (-1 for a missing group or weight), weights (None if equally weighted), sum of weights and number of observations of each group]
+        
+    """
+    
+    codes = compute_codes(data[group])
+    
+    if weights == None:
+        wgts = None
+    else:
+        wgts = data[weights].to_numpy(dtype = numpy.float64)
+        codes[numpy.isnan(wgts)] = -1
+    
+    rows = codes >= 0
+    totals = numpy.bincount(codes[rows], weights = None if wgts is None else wgts[rows], minlength = 2).astype(numpy.float64)
+    sizes = numpy.bincount(codes[rows], minlength = 2)
+    
+    return [codes, wgts, totals, sizes]
+
+#%%
+
+def compute_sparse(data,
+                   group,
+                   variable,
+                   weights = None,
+                   binary = False,
+                   prepared = None):
+    
+    """
+    
+    Computes the sufficient statistics for a sparse (Pandas SparseDtype) variable, conditional on group
+    Only the stored entries of the variable are visited, so time and memory scale with the number of stored entries
+       
+    Parameters:
+        data (dataframe): Pandas DataFrame containing observations (rows) and variables (columns)
+        group (str): Variable defining the two groups
+        variable (str): Sparse variable to be compared across the two groups
+        weights (None or str): Variable defining weights for each observation (otherwise assumed to be equally weighted)
+        binary (bool): Whether the variable is a binary categorical variable, in which case the statistics of the indicator of the level which is not the fill value (or, if the fill value is missing, of the largest level) are computed
+        prepared (None or list): Group codes, weights and sums of weights as returned by prepare_sparse() (otherwise extracted from the data)
+    
+    Returns:
+        Numpy array in the same format as compute_moments(), with one entry per group
+        
+    """
+    
+    column = data[variable].array
+    values = column.sp_values
+    indices = column.sp_index.to_int_index().indices
+    fill = column.fill_value
+    
+    if prepared is None:
+        prepared = prepare_sparse(data = data, group = group, weights = weights)
+    
+    codes, wgts, totals, sizes = prepared
+    codes = codes[indices]
+    wgts = numpy.ones(shape = len(indices)) if wgts is None else wgts[indices]
+    
+    if pandas.isna(fill):
+        
+        # Implicit entries are missing, so only the stored entries are observations
+        
+        if binary:
+            values = numpy.where(numpy.isnan(values), numpy.nan, values == numpy.nanmax(values))
+        
+        return compute_moments(values = values, codes = codes, weights = wgts)
+    
+    # Implicit entries are equal to the fill value, so they are observations, and stored missing values are removed from the sums of weights
+    
+    missing = numpy.isnan(values)
+    
+    if binary:
+        values = numpy.where(missing, numpy.nan, values != fill)
+        fill = 0.0
+    
+    totals = totals - numpy.bincount(codes[missing & (codes >= 0)], weights = wgts[missing & (codes >= 0)], minlength = 2)
+    
+    rows = (codes >= 0) & ~missing
+    implicit = sizes - numpy.bincount(codes[codes >= 0], minlength = 2)
+    
+    codes = codes[rows]
+    wgts = wgts[rows]
+    values = values[rows]
+    
+    # Weight of the implicit entries, which is exactly zero if every observation is stored
+    
+    implicit = numpy.where(implicit > 0, totals - numpy.bincount(codes, weights = wgts, minlength = 2), 0)
+    
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        mean = fill + numpy.bincount(codes, weights = wgts * (values - fill), minlength = 2) / totals
+    
+    # Sum of squared deviations from the mean, over the stored entries and the implicit entries
+    
+    deviation = numpy.bincount(codes, weights = wgts * (values - mean[codes]) ** 2, minlength = 2) + implicit * (fill - mean) ** 2
+    deviation = numpy.where(totals > 0, deviation, 0)
+    
+    return numpy.stack([totals, mean, deviation])
+
+#%%
+
+def sort_runs(values,
+              codes,
+              weights,
+              chunksize,
+              directory):
+    
+    """
+    
+    Sorts a variable in chunks and spills each sorted chunk (run) to memory-mapped files, for external sorting
+    Missing values are excluded, observations with missing group or weight are kept (for ranking) with group code -1
+       
+    Parameters:
+        values (array): Numpy array (or memory-mapped array) of values to be sorted
+        codes (array): Group codes as returned by compute_codes()
+        weights (None or array): Weights for each observation (otherwise assumed to be equally weighted)
+        chunksize (int): Number of observations sorted in memory at once
+        directory (str): Directory in which the runs are written
+    
+    Returns:
+        List of runs, each in the format: [sorted values, group codes, weights]
+        
+    """
+    
+    runs = []
+    
+    for start in range(0, len(values), chunksize):
+        
+        vals = numpy.asarray(values[start:start + chunksize], dtype = numpy.float64)
+        grps = numpy.asarray(codes[start:start + chunksize], dtype = numpy.int8)
+        
+        if weights is None:
+            wgts = numpy.ones(shape = len(vals))
+        else:
+            wgts = numpy.asarray(weights[start:start + chunksize], dtype = numpy.float64)
+            grps = numpy.where(numpy.isnan(wgts), -1, grps).astype(numpy.int8)
+        
+        observed = ~numpy.isnan(vals)
+        order = numpy.argsort(vals[observed], kind = 'stable')
+        
+        run = []
+        
+        for name, array in [('values', vals[observed][order]), ('codes', grps[observed][order]), ('weights', wgts[observed][order])]:
+            
+            path = os.path.join(directory, 'run' + str(len(runs)) + '_' + name + '.npy')
+            mapped = numpy.lib.format.open_memmap(path, mode = 'w+', dtype = array.dtype, shape = array.shape)
+            mapped[:] = array
+            mapped.flush()
+            run.append(mapped)
+        
+        runs.append(run)
+    
+    return runs
+
+#%%
+
+def merge_runs(runs,
+               buffer):
+    
+    """
+    
+    Merges sorted runs (k-way), assigning average ranks to ties and accumulating the sufficient statistics of the ranks, conditional on group
+       
+    Parameters:
+        runs (list): Sorted runs as returned by sort_runs()
+        buffer (int): Number of observations read from each run at once
+    
+    Returns:
+        Numpy array in the same format as compute_moments()
+        
+    """
+    
+    moments = numpy.zeros(shape = (3, 2))
+    positions = [0] * len(runs)
+    offset = 0
+    
+    while any(positions[i] < len(runs[i][0]) for i in range(len(runs))):
+        
+        # Values below the bound cannot appear later in any run, so they can be ranked now
+        
+        bound = numpy.inf
+        
+        for i, (vals, grps, wgts) in enumerate(runs):
+            if positions[i] + buffer < len(vals):
+                bound = min(bound, vals[positions[i] + buffer - 1])
+        
+        lower = []
+        upper = []
+        
+        for i, (vals, grps, wgts) in enumerate(runs):
+            remaining = vals[positions[i]:]
+            if bound == numpy.inf:
+                lower.append(len(remaining))
+                upper.append(len(remaining))
+            else:
+                lower.append(int(numpy.searchsorted(remaining, bound, side = 'left')))
+                upper.append(int(numpy.searchsorted(remaining, bound, side = 'right')))
+        
+        batch = [numpy.concatenate([run[j][positions[i]:positions[i] + lower[i]] for i, run in enumerate(runs)]) for j in range(3)]
+        
+        if len(batch[0]) > 0:
+            
+            ranks = scipy.stats.rankdata(batch[0], method = 'average') + offset
+            moments = combine_moments(moments, compute_moments(values = ranks, codes = batch[1], weights = batch[2]))
+            offset = offset + len(ranks)
+        
+        # Values equal to the bound are ties sharing one average rank, so only their weights are needed
+        
+        ties = sum(upper) - sum(lower)
+        
+        if ties > 0:
+            
+            totals = numpy.zeros(shape = 2)
+            
+            for i, (vals, grps, wgts) in enumerate(runs):
+                for start in range(positions[i] + lower[i], positions[i] + upper[i], buffer):
+                    stop = min(start + buffer, positions[i] + upper[i])
+                    observed = grps[start:stop] >= 0
+                    totals = totals + numpy.bincount(grps[start:stop][observed], weights = wgts[start:stop][observed], minlength = 2)
+            
+            rank = offset + (ties + 1) / 2
+            moments = combine_moments(moments, numpy.stack([totals, numpy.full(shape = 2, fill_value = rank), numpy.zeros(shape = 2)]))
+            offset = offset + ties
+        
+        positions = [positions[i] + upper[i] for i in range(len(runs))]
+    
+    return moments
+
+#%%
+
+def compute_ranked(values,
+                   codes,
+                   weights = None,
+                   chunksize = 1000000,
+                   directory = None):
+    
+    """
+    
+    Computes the sufficient statistics of the (average) ranks of a variable, conditional on group, without holding the variable in memory
+    Sorted runs are spilled to memory-mapped files and merged, assigning ranks as in Series.rank(method = 'average')
+       
+    Parameters:
+        values (array): Numpy array (or memory-mapped array) of values to be ranked
+        codes (array): Group codes as returned by compute_codes()
+        weights (None or array): Weights for each observation (otherwise assumed to be equally weighted)
+        chunksize (int): Number of observations sorted (and merged) in memory at once
+        directory (None or str): Directory in which temporary files are written (otherwise the system default)
+    
+    Returns:
+        Numpy array in the same format as compute_moments()
+        
+    """
+    
+    with tempfile.TemporaryDirectory(dir = directory) as folder:
+        
+        runs = sort_runs(values = values, codes = codes, weights = weights, chunksize = chunksize, directory = folder)
+        moments = merge_runs(runs = runs, buffer = max(chunksize // max(len(runs), 1), 1))
+        
+        # Releasing the memory maps before the temporary files are removed
+        
+        del runs
+    
+    return moments
+
+#%%
+
+def compute_variable(data,
+                     group,
+                     variable,
+                     continuous,
+                     skewed = [],
+                     weights = None,
+                     decimals = 2,
+                     intervals = None,
+                     chunksize = None,
+                     metrics = [],
+                     workers = None,
+                     prepared = None):
+    
+    """
+    
+    Computes SD for a single variable, as a continuous variable (if it is in continuous) or as a categorical variable (otherwise)
+       
+    Parameters:
+        data (dataframe): Pandas DataFrame containing observations (rows) and variables (columns)
+        group (str): Variable defining the two groups
+        variable (str): Variable to be compared across the two groups
+        continuous (list): List of string items which are names of the continuous variables
+        skewed (list): List of string items which are names of the continuous variables which have a skewed distribution (ranked SD computed)
+        weights (None or str): Variable defining weights for each observation (otherwise assumed to be equally weighted)
+        decimals (int): Number of decimal places which should be computed
+        intervals (None or float): Whether CIs should be computed and with what coverage e.g. for 95% CI, intervals = 0.95
+        chunksize (None or int): For skewed variables, number of observations ranked in memory at once (otherwise the whole variable is ranked in memory)
+        metrics (list): Distributional balance metrics which should be computed for continuous variables (missing for categorical variables)
+        workers (None or int): Number of threads across which blocks of rows are computed (otherwise all rows are computed at once)
+        prepared (None or list): Group codes, weights and sums of weights as returned by prepare_sparse(), shared by all sparse variables (otherwise extracted from the data)
+    
+    Returns:
+        Computed SD or list containing SD and CI (and metrics), if requested
+        
+    """
+    
+    if variable in continuous:
+        
+        return compute_continuous(data = data,
+                                  group = group,
+                                  variable = variable,
+                                  skewed = variable in skewed,
+                                  weights = weights,
+                                  decimals = decimals,
+                                  intervals = intervals,
+                                  chunksize = chunksize,
+                                  metrics = metrics,
+                                  workers = workers,
+                                  prepared = prepared)
+    
+    else:
+        
+        stdiff = compute_categorical(data = data,
+                                     group = group, 
+                                     variable = variable,
+                                     weights = weights,
+                                     decimals = decimals,
+                                     intervals = intervals,
+                                     workers = workers,
+                                     prepared = prepared)
+        
+        if len(metrics) == 0:
+            
+            return stdiff
+        
+        else:
+            
+            row = list(stdiff) if type(stdiff) == tuple else [stdiff]
+            
+            return tuple(row + [numpy.nan] * len(metrics))
+
+#%%
+
+def format_results(results,
+                   variables,
+                   intervals = None,
+                   metrics = [],
+                   pvalues = False):
+    
+    """
+    
+    Collects the computed SDs into a table, with one row per variable
+       
+    Parameters:
+        results (list): Computed SDs (or lists containing SD and CI) as returned by compute_variable(), in the same order as variables
+        variables (list): Names of the variables for which SDs were computed
+        intervals (None or float): Whether CIs were computed and with what coverage e.g. for 95% CI, intervals = 0.95
+        metrics (list): Distributional balance metrics which were computed
+        pvalues (bool): Whether permutation test p-values were computed (as the last entry of each result)
+    
+    Returns:
+        Pandas DataFrame containing the computed SDs (and CIs, metrics and p-values, if specified)
+        
+    """
+    
+    results = pandas.DataFrame(data = results)
+    results.set_axis([variables], axis = 0, inplace = True)
+    
+    # Labelling the CIs, metrics and p-values
+    
+    labels = ['ES']
+    
+    if intervals != None:
+        
+        ci_label = round(( intervals * 100 ), ndigits = 2)
+        labels.append(str(ci_label) + '% CI')
+    
+    for metric in metrics:
+        
+        labels.append({'variance': 'Variance ratio', 'ks': 'KS', 'ecdf': 'eCDF mean'}[metric])
+    
+    if pvalues:
+        
+        labels.append('p-value')
+    
+    results.set_axis(labels, axis = 1, inplace = True)
+    
+    return results
+
+#%%
+
+def compute_mahalanobis(prob0,
+                        prob1):
+    
+    """
+    
+    Computes SDs for categorical variables (Mahalanobis distance, as in compute_categorical()) for many pairs of probability vectors at once
+       
+    Parameters:
+        prob0 (array): Numpy array of the probability of each level in group 0, with one row per pair and one column per level
+        prob1 (array): Numpy array of the probability of each level in group 1, in the same format as prob0
+    
+    Returns:
+        Numpy array of SDs (unrounded), one per pair
+        
+    """
+    
+    identity = numpy.eye(prob0.shape[1])
+    covariance = (prob1[:, :, None] * identity - prob1[:, :, None] * prob1[:, None, :] +
+                  prob0[:, :, None] * identity - prob0[:, :, None] * prob0[:, None, :]) / 2
+    
+    # Dropping the 1st level as there are n-1 degrees of freedom
+    
+    difference = (prob1 - prob0)[:, 1:]
+    inverse = numpy.linalg.pinv(covariance[:, 1:, 1:], hermitian = True)
+    
+    return numpy.sqrt(numpy.einsum('bi,bij,bj->b', difference, inverse, difference))
+
+#%%
+
+def permute_stdiff(labels,
+                   weights,
+                   weighted,
+                   squared,
+                   blocks):
+    
+    """
+    
+    Computes SDs for many group labellings at once, as matrix products of the group indicator matrix and the design matrix
+       
+    Parameters:
+        labels (array): Numpy array of group codes with one row per labelling (permutation) and one column per observation
+        weights (array): Weights for each observation
+        weighted (array): Design matrix (one row per observation) multiplied by the weights
+        squared (array): Squared design matrix multiplied by the weights
+        blocks (list): One entry per variable in the format: [first column, last column + 1, continuous (bool)] of the design matrix
+    
+    Returns:
+        Numpy array of SDs (unrounded) with one row per labelling and one column per variable
+        
+    """
+    
+    indicator = (labels == 1).astype(numpy.float64)
+    
+    # Sums in group 1 from the matrix products, sums in group 0 as the remainder of the totals
+    
+    weight1 = indicator @ weights
+    weight0 = weights.sum() - weight1
+    
+    sums1 = indicator @ weighted
+    sums0 = weighted.sum(axis = 0) - sums1
+    
+    squares1 = indicator @ squared
+    squares0 = squared.sum(axis = 0) - squares1
+    
+    stdiffs = []
+    
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        
+        for start, stop, continuous in blocks:
+            
+            if continuous:
+                
+                mean1 = sums1[:, start] / weight1
+                mean0 = sums0[:, start] / weight0
+                
+                variance1 = (squares1[:, start] - weight1 * mean1 ** 2) / (weight1 - 1)
+                variance0 = (squares0[:, start] - weight0 * mean0 ** 2) / (weight0 - 1)
+                
+                stdiffs.append((mean1 - mean0) / numpy.sqrt((variance0 + variance1) / 2))
+                
+            else:
+                
+                prob1 = sums1[:, start:stop] / weight1[:, None]
+                prob0 = sums0[:, start:stop] / weight0[:, None]
+                
+                stdiffs.append(compute_mahalanobis(prob0 = prob0, prob1 = prob1))
+    
+    return numpy.stack(stdiffs, axis = 1)
+
+#%%
+
+def compute_permutations(data,
+                         group,
+                         variables,
+                         continuous,
+                         skewed = [],
+                         weights = None,
+                         permutations = 1000,
+                         seed = None,
+                         workers = None):
+    
+    """
+    
+    Computes permutation test p-values for the SDs, by shuffling the group labels
+    All variables with the same missing observations are evaluated together, in batches of permutations computed in parallel
+       
+    Parameters:
+        data (dataframe): Pandas DataFrame containing observations (rows) and variables (columns)
+        group (str): Variable defining the two groups
+        variables (list): Variables for which p-values should be computed
+        continuous (list): List of string items which are names of the continuous variables
+        skewed (list): List of string items which are names of the continuous variables which have a skewed distribution (ranked SD computed)
+        weights (None or str): Variable defining weights for each observation (otherwise assumed to be equally weighted)
+        permutations (int): Number of permutations of the group labels
+        seed (None or int): Seed for the random number generator
+        workers (None or int): Number of threads across which the permutations are computed (otherwise computed in a single thread)
+    
+    Returns:
+        List of p-values, in the same order as variables
+        
+    """
+    
+    codes = compute_codes(data[group])
+    
+    if weights == None:
+        wgts = numpy.ones(shape = len(codes))
+    else:
+        wgts = data[weights].to_numpy(dtype = numpy.float64)
+    
+    observed = (codes >= 0) & ~numpy.isnan(wgts)
+    
+    # Building the design matrix for each variable, grouping variables with the same missing observations
+    
+    designs = {}
+    
+    for variable in variables:
+        
+        column = data[variable]
+        
+        if isinstance(column.dtype, pandas.SparseDtype):
+            column = column.sparse.to_dense()
+        
+        rows = observed & column.notna().to_numpy()
+        
+        if variable in continuous:
+            
+            # Skewed variables are ranked over all non-missing values, as in compute_continuous(), and then subset
+            
+            if variable in skewed:
+                values = column.rank(method = 'average')[rows]
+            else:
+                values = column[rows]
+            
+            # Centering does not change the SD but avoids loss of precision in the sums of squares
+            
+            values = values.to_numpy(dtype = numpy.float64)
+            design = (values - numpy.average(values, weights = wgts[rows]))[:, None]
+            
+        else:
+            
+            levels = pandas.factorize(column[rows], sort = True)[0]
+            design = numpy.eye(levels.max() + 1)[levels]
+        
+        designs.setdefault(rows.tobytes(), [rows, []])[1].append([variable, design, variable in continuous])
+    
+    # Splitting the permutations into batches, each with its own random number generator
+    
+    batchsize = max(1, min(permutations, 10 ** 7 // max(int(observed.sum()), 1)))
+    sizes = [batchsize] * (permutations // batchsize) + ([permutations % batchsize] if permutations % batchsize else [])
+    sequences = numpy.random.SeedSequence(seed).spawn(len(sizes))
+    
+    pvalues = {}
+    
+    for rows, members in designs.values():
+        
+        grps = codes[rows]
+        wgts_rows = wgts[rows]
+        
+        design = numpy.concatenate([member[1] for member in members], axis = 1)
+        weighted = wgts_rows[:, None] * design
+        squared = weighted * design
+        
+        blocks = []
+        start = 0
+        
+        for variable, block, kind in members:
+            blocks.append([start, start + block.shape[1], kind])
+            start = start + block.shape[1]
+        
+        def evaluate(batch):
+            
+            generator = numpy.random.default_rng(batch[1])
+            labels = generator.permuted(numpy.tile(grps, (batch[0], 1)), axis = 1)
+            
+            return permute_stdiff(labels = labels, weights = wgts_rows, weighted = weighted, squared = squared, blocks = blocks)
+        
+        actual = permute_stdiff(labels = grps[None, :], weights = wgts_rows, weighted = weighted, squared = squared, blocks = blocks)[0]
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers = workers or 1) as executor:
+            permuted = numpy.concatenate(list(executor.map(evaluate, zip(sizes, sequences))), axis = 0)
+        
+        # Two-sided p-values, counting the observed labelling as one of the permutations
+        
+        extreme = numpy.abs(permuted) >= numpy.abs(actual) * (1 - 1e-12)
+        
+        for i, member in enumerate(members):
+            pvalues[member[0]] = (1 + extreme[:, i].sum()) / (permutations + 1)
+    
+    return [pvalues[variable] for variable in variables]
+
+#%%
+
+def compute_imputed(data,
+                    group,
+                    imputation,
+                    variable,
+                    continuous = True,
+                    skewed = False,
+                    weights = None):
+    
+    """
+    
+    Computes SDs for a variable in each imputed dataset, from stacked (long format) imputations
+    The sums for all imputations are computed at once, grouped by imputation and group
+       
+    Parameters:
+        data (dataframe): Pandas DataFrame containing the stacked imputed datasets
+        group (str): Variable defining the two groups
+        imputation (str): Variable defining the imputed dataset to which each observation belongs
+        variable (str): Variable to be compared across the two groups
+        continuous (bool): Whether the variable is continuous (otherwise categorical)
+        skewed (bool): Whether the continuous variable has a skewed distribution (ranked SD computed)
+        weights (None or str): Variable defining weights for each observation (otherwise assumed to be equally weighted)
+    
+    Returns:
+        List in the format: [SDs (unrounded), sizes (or sums of weights) of group 0, sizes of group 1], each with one entry per imputation
+        
+    """
+    
+    codes = compute_codes(data[group])
+    imputations, levels = pandas.factorize(data[imputation], sort = True)
+    count = len(levels)
+    
+    if weights == None:
+        wgts = numpy.ones(shape = len(codes))
+    else:
+        wgts = data[weights].to_numpy(dtype = numpy.float64)
+    
+    column = data[variable]
+    
+    if isinstance(column.dtype, pandas.SparseDtype):
+        column = column.sparse.to_dense()
+    
+    rows = (codes >= 0) & (imputations >= 0) & ~numpy.isnan(wgts) & column.notna().to_numpy()
+    cells = imputations[rows] * 2 + codes[rows]
+    wgts = wgts[rows]
+    
+    if continuous:
+        
+        # Ranks are computed within each imputed dataset
+        
+        if skewed:
+            column = column.groupby(data[imputation]).rank(method = 'average')
+        
+        values = column.to_numpy(dtype = numpy.float64)[rows]
+        values = values - numpy.average(values, weights = wgts)
+        
+        total = numpy.bincount(cells, weights = wgts, minlength = 2 * count).reshape(count, 2)
+        sums = numpy.bincount(cells, weights = wgts * values, minlength = 2 * count).reshape(count, 2)
+        squares = numpy.bincount(cells, weights = wgts * values ** 2, minlength = 2 * count).reshape(count, 2)
+        
+        with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+            
+            mean = sums / total
+            variance = (squares - total * mean ** 2) / (total - 1)
+            stdiffs = (mean[:, 1] - mean[:, 0]) / numpy.sqrt((variance[:, 0] + variance[:, 1]) / 2)
+        
+    else:
+        
+        categories = pandas.factorize(column[rows], sort = True)[0]
+        width = categories.max() + 1
+        
+        table = numpy.bincount(cells * width + categories, weights = wgts, minlength = 2 * count * width).reshape(count, 2, width)
+        total = table.sum(axis = 2)
+        
+        with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+            stdiffs = compute_mahalanobis(prob0 = table[:, 0] / total[:, 0, None], prob1 = table[:, 1] / total[:, 1, None])
+    
+    return [stdiffs, total[:, 0], total[:, 1]]
+
+#%%
+
+def pool_stdiff(stdiffs,
+                n0,
+                n1,
+                decimals = 2,
+                intervals = None):
+    
+    """
+    
+    Pools SDs computed in each imputed dataset using Rubin's rules
+       
+    Parameters:
+        stdiffs (array): SDs (unrounded) computed in each imputed dataset
+        n0 (array): Number of observations (or sum of weights) in group 0 in each imputed dataset
+        n1 (array): Number of observations (or sum of weights) in group 1 in each imputed dataset
+        decimals (int): Number of decimal places which should be computed
+        intervals (None or float): Whether CIs should be computed and with what coverage e.g. for 95% CI, intervals = 0.95
+    
+    Returns:
+        Pooled SD or list containing pooled SD and CI, if requested
+        
+    """
+    
+    count = len(stdiffs)
+    stdiff = stdiffs.mean()
+    
+    if intervals == None:
+        
+        return numpy.round(stdiff, decimals)
+    
+    # Within-imputation variance (as in compute_bounds()) and between-imputation variance
+    
+    total = n0 + n1
+    within = ( (total / (n0 * n1)) + ((stdiffs ** 2) / (2 * total)) ).mean()
+    between = stdiffs.var(ddof = 1) if count > 1 else 0
+    variance = within + (1 + 1 / count) * between
+    
+    # Degrees of freedom of the t-distribution (Rubin, 1987)
+    
+    if between > 0:
+        freedom = (count - 1) * (1 + within / ((1 + 1 / count) * between)) ** 2
+    else:
+        freedom = numpy.inf
+    
+    percentile = 1 - ((1 - intervals) / 2)
+    tscore = scipy.stats.t.ppf(percentile, freedom)
+    
+    lower_ci = numpy.round(stdiff - tscore * numpy.sqrt(variance), decimals)
+    upper_ci = numpy.round(stdiff + tscore * numpy.sqrt(variance), decimals)
+    
+    return numpy.round(stdiff, decimals), [lower_ci, upper_ci]
+
+#%%
+
+def split_rows(count,
+               blocks):
+    
+    """
+    
+    Splits the rows into contiguous blocks of (almost) equal size
+       
+    Parameters:
+        count (int): Number of rows
+        blocks (int): Number of blocks
+    
+    Returns:
+        List of blocks, each in the format: [first row, last row + 1]
+        
+    """
+    
+    bounds = numpy.linspace(0, count, num = min(blocks, max(count, 1)) + 1).astype(int)
+    
+    return [[bounds[i], bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+#%%
+
+def merge_pairwise(partials,
+                   combine):
+    
+    """
+    
+    Combines partial results pairwise (as a balanced tree), which keeps rounding errors small
+       
+    Parameters:
+        partials (list): Partial results, e.g. sufficient statistics of blocks of rows
+        combine (function): Function combining two partial results into one
+    
+    Returns:
+        Combined result
+        
+    """
+    
+    while len(partials) > 1:
+        
+        merged = [combine(partials[i], partials[i + 1]) for i in range(0, len(partials) - 1, 2)]
+        
+        if len(partials) % 2 == 1:
+            merged.append(partials[-1])
+        
+        partials = merged
+    
+    return partials[0]
+
+#%%
+
+def compute_blocked_moments(values,
+                            codes,
+                            weights = None,
+                            workers = 1):
+    
+    """
+    
+    Computes the sufficient statistics for continuous variables, conditional on group, in blocks of rows across threads
+       
+    Parameters:
+        values (array): Numpy array of values, as for compute_moments()
+        codes (array): Group codes as returned by compute_codes()
+        weights (None or array): Weights for each observation (otherwise assumed to be equally weighted)
+        workers (int): Number of threads across which the blocks are computed
+    
+    Returns:
+        Numpy array in the same format as compute_moments()
+        
+    """
+    
+    def evaluate(block):
+        
+        start, stop = block
+        wgts = None if weights is None else weights[start:stop]
+        
+        return compute_moments(values = values[start:stop], codes = codes[start:stop], weights = wgts)
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers = workers) as executor:
+        partials = list(executor.map(evaluate, split_rows(count = len(codes), blocks = 4 * workers)))
+    
+    return merge_pairwise(partials = partials, combine = combine_moments)
+
+#%%
+
+def compute_blocked_table(categories,
+                          codes,
+                          weights = None,
+                          workers = 1):
+    
+    """
+    
+    Computes the (weighted) number of observations in each level of a categorical variable, conditional on group, in blocks of rows across threads
+       
+    Parameters:
+        categories (array): Numpy array of level codes, where missing values are coded as -1 (e.g. as returned by pandas.factorize)
+        codes (array): Group codes as returned by compute_codes()
+        weights (None or array): Weights for each observation (otherwise assumed to be equally weighted)
+        workers (int): Number of threads across which the blocks are computed
+    
+    Returns:
+        Numpy array with one row per group and one column per level
+        
+    """
+    
+    width = categories.max() + 1
+    
+    def evaluate(block):
+        
+        start, stop = block
+        grps = codes[start:stop]
+        cats = categories[start:stop]
+        wgts = numpy.ones(shape = stop - start) if weights is None else weights[start:stop]
+        
+        rows = (grps >= 0) & (cats >= 0) & ~numpy.isnan(wgts)
+        
+        return numpy.bincount(grps[rows] * width + cats[rows], weights = wgts[rows], minlength = 2 * width).reshape(2, width)
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers = workers) as executor:
+        partials = list(executor.map(evaluate, split_rows(count = len(codes), blocks = 4 * workers)))
+    
+    return merge_pairwise(partials = partials, combine = numpy.add)
+
+#%%
+
+def partition_statistics(partition,
+                         group,
+                         continuous,
+                         categorical,
+                         weights = None):
+    
+    """
+    
+    Computes the sufficient statistics for all variables in one partition of a Dask DataFrame, keyed on the values of the group variable
+    Keying on the group values (rather than codes) means partitions containing only one group can be combined
+       
+    Parameters:
+        partition (dataframe): Pandas DataFrame containing the observations in the partition
+        group (str): Variable defining the two groups
+        continuous (list): List of string items which are names of the continuous variables
+        categorical (list): List of string items which are names of the categorical variables
+        weights (None or str): Variable defining weights for each observation (otherwise assumed to be equally weighted)
+    
+    Returns:
+        Dictionary with, for each continuous variable, a DataFrame of [sum of weights, mean, sum of squared deviations] by group value and,
+        for each categorical variable, a Series of the sum of weights by group value and level
+        
+    """
+    
+    if weights == None:
+        wgts = pandas.Series(1.0, index = partition.index)
+    else:
+        wgts = partition[weights].astype(numpy.float64)
+    
+    statistics = {}
+    
+    for variable in continuous + categorical:
+        
+        rows = partition[group].notna() & partition[variable].notna() & wgts.notna()
+        grps = partition[group][rows]
+        wgts_rows = wgts[rows]
+        
+        if variable in continuous:
+            
+            values = partition[variable][rows].astype(numpy.float64)
+            
+            total = wgts_rows.groupby(grps).sum()
+            mean = (wgts_rows * values).groupby(grps).sum() / total
+            deviation = (wgts_rows * (values - grps.map(mean)) ** 2).groupby(grps).sum()
+            
+            statistics[variable] = pandas.DataFrame({'total': total, 'mean': mean, 'deviation': deviation})
+            
+        else:
+            
+            statistics[variable] = wgts_rows.groupby([grps, partition[variable][rows]]).sum()
+    
+    return statistics
+
+#%%
+
+def combine_statistics(first,
+                       second):
+    
+    """
+    
+    Combines the sufficient statistics of two partitions, as returned by partition_statistics()
+       
+    Parameters:
+        first (dict): Sufficient statistics as returned by partition_statistics()
+        second (dict): Sufficient statistics as returned by partition_statistics()
+    
+    Returns:
+        Dictionary in the same format as partition_statistics()
+        
+    """
+    
+    combined = {}
+    
+    for variable in first:
+        
+        if isinstance(first[variable], pandas.DataFrame):
+            
+            index = first[variable].index.union(second[variable].index)
+            moments = [first[variable].reindex(index).fillna(0).to_numpy().T, second[variable].reindex(index).fillna(0).to_numpy().T]
+            
+            combined[variable] = pandas.DataFrame(combine_moments(moments[0], moments[1]).T, index = index, columns = ['total', 'mean', 'deviation'])
+            
+        else:
+            
+            combined[variable] = first[variable].add(second[variable], fill_value = 0)
+    
+    return combined
+
+#%%
+
+def finalize_statistics(statistics,
+                        variables,
+                        decimals = 2,
+                        intervals = None):
+    
+    """
+    
+    Computes SDs from the combined sufficient statistics of all partitions
+       
+    Parameters:
+        statistics (dict): Sufficient statistics as returned by combine_statistics()
+        variables (list): Variables for which SDs should be computed
+        decimals (int): Number of decimal places which should be computed
+        intervals (None or float): Whether CIs should be computed and with what coverage e.g. for 95% CI, intervals = 0.95
+    
+    Returns:
+        List of computed SDs (or lists containing SD and CI, if requested), in the same order as variables
+        
+    """
+    
+    results = []
+    
+    for variable in variables:
+        
+        if isinstance(statistics[variable], pandas.DataFrame):
+            
+            moments = statistics[variable].sort_index()
+            assert len(moments) == 2, "Group variable must define exactly two groups"
+            
+            moments = moments.to_numpy().T
+            stdiff = compute_stdiff(moments = moments).round(decimals)
+            total = moments[0]
+            
+        else:
+            
+            table = statistics[variable].unstack(fill_value = 0).sort_index()
+            assert len(table) == 2, "Group variable must define exactly two groups"
+            
+            table = table.to_numpy()
+            total = table.sum(axis = 1)
+            stdiff = compute_mahalanobis(prob0 = table[None, 0] / total[0], prob1 = table[None, 1] / total[1])[0].round(decimals)
+        
+        if intervals == None:
+            results.append(stdiff)
+        else:
+            results.append((stdiff, compute_bounds(stdiff = stdiff, n0 = total[0], n1 = total[1], decimals = decimals, coverage = intervals)))
+    
+    return results
+
+#%%
+
+def compute_dask(data,
+                 group,
+                 variables,
+                 continuous,
+                 weights = None,
+                 decimals = 2,
+                 intervals = None):
+    
+    """
+    
+    Computes SDs for all variables of a Dask DataFrame as a single task graph
+    Sufficient statistics are computed for each partition, combined in a tree reduction and the SDs computed in a final task
+       
+    Parameters:
+        data (dataframe): Dask DataFrame containing observations (rows) and variables (columns)
+        group (str): Variable defining the two groups
+        variables (list): Variables for which SDs should be computed
+        continuous (list): List of string items which are names of the continuous variables
+        weights (None or str): Variable defining weights for each observation (otherwise assumed to be equally weighted)
+        decimals (int): Number of decimal places which should be computed
+        intervals (None or float): Whether CIs should be computed and with what coverage e.g. for 95% CI, intervals = 0.95
+    
+    Returns:
+        List of computed SDs (or lists containing SD and CI, if requested), in the same order as variables
+        
+    """
+    
+    import dask
+    
+    continuous = [variable for variable in variables if variable in continuous]
+    categorical = [variable for variable in variables if variable not in continuous]
+    columns = [group] + variables + ([] if weights == None else [weights])
+    
+    partials = [dask.delayed(partition_statistics)(partition, group, continuous, categorical, weights) for partition in data[columns].to_delayed()]
+    
+    combined = merge_pairwise(partials = partials, combine = dask.delayed(combine_statistics))
+    results = dask.delayed(finalize_statistics)(combined, variables, decimals, intervals)
+    
+    return results.compute()
+
+#%%
+
+def is_dask(data):
+    
+    """
+    
+    Returns whether the data is a Dask DataFrame (without importing Dask)
+    
+    """
+    
+    return type(data).__module__.split('.')[0] == 'dask' and hasattr(data, 'to_delayed')
+
+#%%
+
+def compute_products(data,
+                     group,
+                     variables,
+                     weights = None,
+                     squares = True,
+                     products = True,
+                     decimals = 2,
+                     intervals = None,
+                     blocksize = 100000):
+    
+    """
+    
+    Computes SDs for the squares and pairwise products of continuous variables without creating the squared and product variables
+    Cross-product sums are accumulated over blocks of rows, observations are excluded for a product if either variable is missing
+       
+    Parameters:
+        data (dataframe): Pandas DataFrame containing observations (rows) and variables (columns)
+        group (str): Variable defining the two groups
+        variables (list): Continuous variables for which squares and products should be computed
+        weights (None or str): Variable defining weights for each observation (otherwise assumed to be equally weighted)
+        squares (bool): Whether SDs for the squares of the variables should be computed
+        products (bool): Whether SDs for the pairwise products of the variables should be computed
+        decimals (int): Number of decimal places which should be computed
+        intervals (None or float): Whether CIs should be computed and with what coverage e.g. for 95% CI, intervals = 0.95
+        blocksize (int): Number of rows for which cross-products are computed at once
+    
+    Returns:
+        List in the format: [names of the terms e.g. 'var1^2' and 'var1 * var2', computed SDs (or lists containing SD and CI, if requested)]
+        
+    """
+    
+    codes = compute_codes(data[group])
+    width = len(variables)
+    
+    if weights == None:
+        wgts = numpy.ones(shape = len(codes))
+    else:
+        wgts = data[weights].to_numpy(dtype = numpy.float64)
+    
+    codes = numpy.where(numpy.isnan(wgts), -1, codes)
+    
+    # Sums of weights, products and squared products for each pair of variables, conditional on group
+    
+    total = numpy.zeros(shape = (2, width, width))
+    sums = numpy.zeros(shape = (2, width, width))
+    squared = numpy.zeros(shape = (2, width, width))
+    
+    for start, stop in split_rows(count = len(codes), blocks = -(-len(codes) // blocksize)):
+        
+        block = numpy.column_stack([data[variable].iloc[start:stop].to_numpy(dtype = numpy.float64) for variable in variables])
+        observed = (~numpy.isnan(block)).astype(numpy.float64)
+        block = numpy.nan_to_num(block, nan = 0.0)
+        
+        for level in [0, 1]:
+            
+            rows = codes[start:stop] == level
+            wgts_rows = wgts[start:stop][rows][:, None]
+            
+            total[level] += observed[rows].T @ (wgts_rows * observed[rows])
+            sums[level] += block[rows].T @ (wgts_rows * block[rows])
+            squared[level] += (block[rows] ** 2).T @ (wgts_rows * block[rows] ** 2)
+    
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        
+        mean = sums / total
+        variance = (squared - total * mean ** 2) / (total - 1)
+        stdiffs = (mean[1] - mean[0]) / numpy.sqrt((variance[0] + variance[1]) / 2)
+    
+    # Collecting the requested terms, squares first
+    
+    pairs = []
+    
+    if squares:
+        pairs = pairs + [[i, i, variables[i] + '^2'] for i in range(width)]
+    
+    if products:
+        pairs = pairs + [[i, j, variables[i] + ' * ' + variables[j]] for i in range(width) for j in range(i + 1, width)]
+    
+    results = []
+    
+    for i, j, name in pairs:
+        
+        stdiff = stdiffs[i, j].round(decimals)
+        
+        if intervals == None:
+            results.append(stdiff)
+        else:
+            results.append((stdiff, compute_bounds(stdiff = stdiff, n0 = total[0, i, j], n1 = total[1, i, j], decimals = decimals, coverage = intervals)))
+    
+    return [[pair[2] for pair in pairs], results]
+
+#%%
+
+def compact_values(column,
+                   downcast = False):
+    
+    """
+    
+    Stores the values of a continuous variable in a narrow type without changing them: integer (e.g. binary indicator) variables in the narrowest of int8, int16 and int32 which fits them (otherwise their own type), float32 variables as float32, other variables as float64
+    Note that float32 keeps about 7 significant digits, so values stored as float64 are rounded if downcast
+       
+    Parameters:
+        column (series): Pandas Series of values of the variable
+        downcast (bool): Whether variables which are not integer are stored as float32
+    
+    Returns:
+        Numpy array of values, where missing values are 0 (integer types) or missing (float types)
+        
+    """
+    
+    if pandas.api.types.is_bool_dtype(column.dtype) or pandas.api.types.is_integer_dtype(column.dtype):
+        
+        values = column.fillna(0)
+        
+        for dtype in [numpy.int8, numpy.int16, numpy.int32]:
+            if values.min() >= numpy.iinfo(dtype).min and values.max() <= numpy.iinfo(dtype).max:
+                return values.to_numpy(dtype = dtype)
+        
+        return values.to_numpy(dtype = numpy.uint64 if pandas.api.types.is_unsigned_integer_dtype(column.dtype) else numpy.int64)
+    
+    dtype = numpy.float32 if downcast or column.dtype in [numpy.float16, numpy.float32] else numpy.float64
+    
+    return column.to_numpy(dtype = dtype, na_value = numpy.nan)
+
+#%%
+
+def compute_windowed(data,
+                     group,
+                     time,
+                     variables,
+                     continuous,
+                     weights = None,
+                     window = 90,
+                     decimals = 2):
+    
+    """
+    
+    Computes SDs in a window of days which moves forward one day at a time, from daily sufficient statistics
+    The statistics of each window are the difference between the cumulative statistics at its last and first day, so each window costs the same whatever the number of observations
+       
+    Parameters:
+        data (dataframe): Pandas DataFrame containing observations (rows) and variables (columns)
+        group (str): Variable defining the two groups
+        time (str): Variable defining the timestamp (or date) of each observation
+        variables (list): Names of the variables for which SDs should be computed
+        continuous (list): List of string items which are names of the continuous variables
+        weights (None or str): Variable defining weights for each observation (otherwise assumed to be equally weighted)
+        window (int): Number of days in each window
+        decimals (int): Number of decimal places which should be computed
+    
+    Returns:
+        List in the format: [last day of each window, Numpy array of SDs with one row per window and one column per variable]
+        
+    """
+    
+    codes = compute_codes(data[group]).astype(numpy.int64)
+    dates = pandas.to_datetime(data[time]).dt.normalize()
+    
+    if weights == None:
+        wgts = numpy.ones(shape = len(codes))
+    else:
+        wgts = data[weights].to_numpy(dtype = numpy.float64)
+    
+    # Day of each observation, counted from the first day
+    
+    first = dates.min()
+    days = ((dates - first).dt.days).to_numpy(dtype = numpy.float64)
+    count = int(numpy.nanmax(days)) + 1
+    
+    valid = (codes >= 0) & ~numpy.isnan(days) & ~numpy.isnan(wgts)
+    days = numpy.where(valid, days, 0).astype(numpy.int64)
+    
+    # Windows end on each day, windows at the start cover fewer days
+    
+    ends = numpy.arange(count) + 1
+    starts = numpy.maximum(ends - window, 0)
+    
+    def accumulate(cells, values, width):
+        
+        # Cumulative sum over days of the daily sums, with a leading zero so that windows are differences
+        
+        daily = numpy.bincount(cells, weights = values, minlength = count * width).reshape(count, width)
+        
+        return numpy.concatenate((numpy.zeros(shape = (1, width)), numpy.cumsum(daily, axis = 0)))
+    
+    results = numpy.full(shape = (count, len(variables)), fill_value = numpy.nan)
+    
+    for index, variable in enumerate(variables):
+        
+        if variable in continuous:
+            
+            # Sums of weights, values and squared values by day and group, with the values centred to limit cancellation
+            
+            values = data[variable].to_numpy(dtype = numpy.float64)
+            rows = valid & ~numpy.isnan(values)
+            
+            if not rows.any():
+                continue
+            
+            values = values[rows] - numpy.average(values[rows], weights = wgts[rows])
+            cells = days[rows] * 2 + codes[rows]
+            
+            sums = [accumulate(cells, wgts[rows] * values ** power, 2) for power in [0, 1, 2]]
+            total, first_moment, second_moment = [cumulative[ends] - cumulative[starts] for cumulative in sums]
+            
+            with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+                
+                mean = first_moment / total
+                variance = (second_moment - total * mean ** 2) / (total - 1)
+                
+                stdiff = (mean[:, 1] - mean[:, 0]) / numpy.sqrt((variance[:, 0] + variance[:, 1]) / 2)
+        
+        else:
+            
+            # Weighted number of observations in each level by day and group
+            
+            categories = pandas.factorize(data[variable], sort = True)[0]
+            rows = valid & (categories >= 0)
+            width = categories.max() + 1
+            
+            if not rows.any():
+                continue
+            
+            cells = (days[rows] * 2 + codes[rows]) * width + categories[rows]
+            
+            table = accumulate(cells, wgts[rows], 2 * width)
+            table = (table[ends] - table[starts]).reshape(count, 2, width)
+            total = table.sum(axis = 2)
+            
+            with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+                
+                prob0 = table[:, 0] / total[:, 0, None]
+                prob1 = table[:, 1] / total[:, 1, None]
+            
+            stdiff = numpy.full(shape = count, fill_value = numpy.nan)
+            observed = (total > 0).all(axis = 1)
+            
+            if observed.any():
+                stdiff[observed] = compute_mahalanobis(prob0 = prob0[observed], prob1 = prob1[observed])
+        
+        results[:, index] = stdiff
+    
+    return [pandas.date_range(start = first, periods = count, freq = 'D'), results.round(decimals)]
+
+#%%
+
+def compute_frequency_ranks(values,
+                            frequencies):
+    
+    """
+    
+    Computes the (average) ranks of a variable in which each observation is repeated a number of times (e.g. in a matched sample, where observations can be matched more than once), without repeating the observations
+       
+    Parameters:
+        values (array): Numpy array of values of the variable
+        frequencies (array): Number of times each observation is repeated
+    
+    Returns:
+        Numpy array of ranks as in Series.rank(method = 'average') of the repeated variable (missing values and observations which are not repeated have missing ranks)
+        
+    """
+    
+    observed = ~numpy.isnan(values) & (frequencies > 0)
+    order = numpy.flatnonzero(observed)[numpy.argsort(values[observed], kind = 'stable')]
+    ordered = values[order]
+    
+    # Ties are the runs of equal sorted values, whose repeated observations take the ranks following all smaller values
+    
+    cumulative = numpy.concatenate(([0], numpy.cumsum(frequencies[order])))
+    starts = numpy.concatenate(([0], numpy.flatnonzero(ordered[1:] != ordered[:-1]) + 1))
+    ends = numpy.concatenate((starts[1:], [len(order)]))
+    
+    ranks = numpy.full(shape = len(values), fill_value = numpy.nan)
+    ranks[order] = numpy.repeat((cumulative[starts] + cumulative[ends] + 1) / 2, ends - starts)
+    
+    return ranks
+
+#%%
+
+def compute_clustered(data,
+                      group,
+                      cluster,
+                      variables,
+                      continuous,
+                      skewed = [],
+                      weights = None,
+                      decimals = 2,
+                      intervals = None):
+    
+    """
+    
+    Computes SDs at the level of clusters (e.g. patients with many rows each), each cluster being one observation
+    Continuous variables are the mean of the rows of each cluster, and categorical variables the proportion of its rows in each level
+       
+    Parameters:
+        data (dataframe): Pandas DataFrame containing observations (rows) and variables (columns)
+        group (str): Variable defining the two groups, which must be the same for all rows of a cluster
+        cluster (str): Variable defining the cluster (e.g. patient ID) of each row
+        variables (list): Names of the variables for which SDs should be computed
+        continuous (list): List of string items which are names of the continuous variables
+        skewed (list): List of string items which are names of the continuous variables which have a skewed distribution (ranked SD computed)
+        weights (None or str): Variable defining weights for each row, the weight of a cluster being the mean weight of its rows (otherwise assumed to be equally weighted)
+        decimals (int): Number of decimal places which should be computed
+        intervals (None or float): Whether CIs should be computed and with what coverage e.g. for 95% CI, intervals = 0.95
+    
+    Returns:
+        List of computed SDs (or lists containing SD and CI, if requested), in the same order as variables
+        
+    """
+    
+    clusters, labels = pandas.factorize(data[cluster])
+    count = len(labels)
+    codes = compute_codes(data[group]).astype(numpy.int64)
+    
+    if weights == None:
+        wgts = numpy.ones(shape = len(codes))
+    else:
+        wgts = data[weights].to_numpy(dtype = numpy.float64)
+    
+    # Group and weight of each cluster, from the rows for which they are not missing
+    
+    rows = (clusters >= 0) & (codes >= 0)
+    size = numpy.bincount(clusters[rows], minlength = count)
+    exposed = numpy.bincount(clusters[rows], weights = codes[rows], minlength = count)
+    
+    assert numpy.all((exposed == 0) | (exposed == size)), "Group variable must be the same for all rows of a cluster"
+    
+    cluster_codes = numpy.where(size > 0, exposed > 0, -1).astype(numpy.int8)
+    
+    rows = (clusters >= 0) & ~numpy.isnan(wgts)
+    
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+        cluster_wgts = numpy.bincount(clusters[rows], weights = wgts[rows], minlength = count) / numpy.bincount(clusters[rows], minlength = count)
+    
+    rows = clusters >= 0
+    
+    results = []
+    
+    for variable in variables:
+        
+        if variable in continuous:
+            
+            # Mean of the rows of each cluster with an observed value
+            
+            values = data[variable].to_numpy(dtype = numpy.float64)
+            observed = rows & ~numpy.isnan(values)
+            
+            with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+                means = numpy.bincount(clusters[observed], weights = values[observed], minlength = count) / numpy.bincount(clusters[observed], minlength = count)
+            
+            if variable in skewed:
+                means = compute_distribution(values = means, codes = cluster_codes)[0]
+            
+            moments = compute_moments(values = means, codes = cluster_codes, weights = cluster_wgts)
+            
+            stdiff = compute_stdiff(moments = moments).round(decimals)
+            total = moments[0]
+        
+        else:
+            
+            # Proportion of the rows of each cluster in each level, averaged over the clusters of each group (with a weight)
+            
+            categories = pandas.factorize(data[variable], sort = True)[0]
+            observed = rows & (categories >= 0)
+            width = categories.max() + 1
+            
+            table = numpy.bincount(clusters[observed] * width + categories[observed], minlength = count * width).reshape(count, width)
+            number = table.sum(axis = 1)
+            present = (number > 0) & ~numpy.isnan(cluster_wgts)
+            
+            weighted = cluster_wgts[present, None] * table[present] / number[present, None]
+            
+            prob = numpy.stack([weighted[cluster_codes[present] == level].sum(axis = 0) for level in [0, 1]])
+            prob = prob[:, prob.sum(axis = 0) > 0]
+            total = prob.sum(axis = 1)
+            
+            stdiff = compute_mahalanobis(prob0 = prob[None, 0] / total[0], prob1 = prob[None, 1] / total[1])[0].round(decimals)
+        
+        if intervals == None:
+            results.append(stdiff)
+        else:
+            results.append((stdiff, compute_bounds(stdiff = stdiff, n0 = total[0], n1 = total[1], decimals = decimals, coverage = intervals)))
+    
+    return results
@@ -1,5 +1,7 @@
 # Testing effectsize.compute()
 
+import numpy
+import pandas
 import effectsize
 
 simulation = open("{Insert path to}/simulating_data.py").read()
@@ -73,3 +75,415 @@ effectsize.compute(data = df,
                    categorical = ["var3", "var4"],
                    skewed = ["var2"],
                    weights = "wgt")
+
+
+#%%
+
+# Screening SDs
+
+## Top 2 variables
+effectsize.screen(data = df,
+                  group = "group",
+                  variables = ["var1", "var2", "var3"],
+                  top = 2)
+
+## Small blocks + weights
+effectsize.screen(data = df,
+                  group = "group",
+                  variables = ["var1", "var2", "var3"],
+                  weights = "wgt",
+                  blocksize = 1)
+
+## Sparse matrix
+import scipy.sparse
+
+effectsize.screen(data = scipy.sparse.csr_matrix(df[["var1", "var2", "var3"]].to_numpy()),
+                  group = df["group"].to_numpy(),
+                  variables = ["var1", "var2", "var3"],
+                  weights = df["wgt"].to_numpy())
+
+
+#%%
+
+# Sparse variables
+
+df_sparse = df.astype({"var1": pandas.SparseDtype("float", 0),
+                       "var3": pandas.SparseDtype("float", 0),
+                       "var4": pandas.SparseDtype("float", 0)})
+
+## Should match "All + weights"
+effectsize.compute(data = df_sparse,
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   categorical = ["var3", "var4"],
+                   skewed = ["var2"],
+                   weights = "wgt")
+
+
+#%%
+
+# Out-of-core ranking of skewed variables
+
+## Should match "All variables"
+effectsize.compute(data = df,
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   categorical = ["var3", "var4"],
+                   skewed = ["var2"],
+                   chunksize = 30)
+
+
+#%%
+
+# Asynchronous computation
+
+import asyncio
+
+## Should match "All + 95% CIs"
+asyncio.run(effectsize.compute_async(data = df,
+                                     group = "group",
+                                     continuous = ["var1", "var2"],
+                                     categorical = ["var3", "var4"],
+                                     skewed = ["var2"],
+                                     intervals = 0.95,
+                                     timeout = 60))
+
+## Streaming results as they are computed
+async def stream():
+    
+    async for variable, stdiff in effectsize.compute_stream(data = df,
+                                                            group = "group",
+                                                            continuous = ["var1", "var2"],
+                                                            categorical = ["var3", "var4"]):
+        print(variable, stdiff)
+
+asyncio.run(stream())
+
+
+#%%
+
+# Caching results
+
+## In memory (second call is a hit)
+cache = effectsize.MemoryCache(maxsize = 16, ttl = 3600)
+
+for repeat in range(2):
+    effectsize.compute(data = df,
+                       group = "group",
+                       continuous = ["var1", "var2"],
+                       categorical = ["var3", "var4"],
+                       cache = cache)
+
+cache.info()
+
+## On disk
+import tempfile
+
+cache = effectsize.DiskCache(directory = tempfile.mkdtemp(), maxbytes = 10 * 1024 ** 2)
+
+for repeat in range(2):
+    effectsize.compute(data = df,
+                       group = "group",
+                       continuous = ["var1", "var2"],
+                       categorical = ["var3", "var4"],
+                       intervals = 0.95,
+                       cache = cache)
+
+cache.info()
+
+
+#%%
+
+# Permutation tests
+
+## All + 95% CIs + p-values
+effectsize.compute(data = df,
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   categorical = ["var3", "var4"],
+                   skewed = ["var2"],
+                   intervals = 0.95,
+                   permutations = 999,
+                   seed = 1234)
+
+## All + weights + p-values, across 4 threads (same results as a single thread)
+effectsize.compute(data = df,
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   categorical = ["var3", "var4"],
+                   skewed = ["var2"],
+                   weights = "wgt",
+                   permutations = 999,
+                   seed = 1234,
+                   workers = 4)
+
+
+#%%
+
+# Distributional metrics
+
+## All + metrics
+effectsize.compute(data = df,
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   categorical = ["var3", "var4"],
+                   skewed = ["var2"],
+                   metrics = ["variance", "ks", "ecdf"])
+
+## All + weights + metrics
+effectsize.compute(data = df,
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   categorical = ["var3", "var4"],
+                   skewed = ["var2"],
+                   weights = "wgt",
+                   metrics = ["variance", "ks", "ecdf"])
+
+
+#%%
+
+# Pooling across imputed datasets
+
+## 5 imputations of var1 stacked in long format
+sample = numpy.random.RandomState(seed = 1234)
+df_imputed = pandas.concat([df.assign(imp = m, var1 = df["var1"] + sample.normal(scale = 0.3, size = len(df))) for m in range(5)],
+                           ignore_index = True)
+
+effectsize.compute_pooled(data = df_imputed,
+                          group = "group",
+                          imputation = "imp",
+                          continuous = ["var1", "var2"],
+                          categorical = ["var3", "var4"],
+                          skewed = ["var2"],
+                          intervals = 0.95)
+
+## With weights
+effectsize.compute_pooled(data = df_imputed,
+                          group = "group",
+                          imputation = "imp",
+                          continuous = ["var1", "var2"],
+                          categorical = ["var3", "var4"],
+                          skewed = ["var2"],
+                          weights = "wgt",
+                          intervals = 0.95)
+
+
+#%%
+
+# Row-parallel computation
+
+## Should match "All + 95% CIs"
+effectsize.compute(data = df,
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   categorical = ["var3", "var4"],
+                   skewed = ["var2"],
+                   intervals = 0.95,
+                   workers = 4)
+
+
+#%%
+
+# Dask DataFrames
+
+import dask.dataframe
+from dask.distributed import Client, LocalCluster
+
+if __name__ == "__main__":
+    
+    with LocalCluster(n_workers = 2, threads_per_worker = 1) as cluster, Client(cluster):
+        
+        df_dask = dask.dataframe.from_pandas(df, npartitions = 4)
+        
+        ## Should match the results for the Pandas DataFrame
+        effectsize.compute(data = df_dask,
+                           group = "group",
+                           continuous = ["var1", "var2"],
+                           categorical = ["var3", "var4"],
+                           intervals = 0.95)
+        
+        ## With weights
+        effectsize.compute(data = df_dask,
+                           group = "group",
+                           continuous = ["var1", "var2"],
+                           categorical = ["var3", "var4"],
+                           weights = "wgt")
+
+
+#%%
+
+# Squares and products
+
+## Should match the ESs for the squared and product variables
+effectsize.compute(data = df,
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   categorical = ["var3", "var4"],
+                   terms = ["squares", "products"])
+
+## With weights and CIs
+effectsize.compute(data = df,
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   terms = ["products"],
+                   weights = "wgt",
+                   intervals = 0.95)
+
+
+#%%
+
+# Preparing a cohort
+
+cohort = effectsize.prepare(data = df,
+                            group = "group",
+                            continuous = ["var1", "var2"],
+                            categorical = ["var3", "var4"],
+                            skewed = ["var2"])
+
+## Should match effectsize.compute()
+cohort.compute()
+
+## Subset of the variables, with weights and CIs
+cohort.compute(variables = ["var1", "var3"],
+               weights = "wgt",
+               intervals = 0.95)
+
+## Compact mode, should match effectsize.compute()
+effectsize.prepare(data = df,
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   categorical = ["var3", "var4"],
+                   skewed = ["var2"],
+                   compact = True).compute(weights = "wgt")
+
+## Compact mode with downcasting, should match up to the rounding of the values to float32
+effectsize.prepare(data = df,
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   categorical = ["var3", "var4"],
+                   skewed = ["var2"],
+                   compact = True,
+                   downcast = True).compute(weights = "wgt")
+
+
+#%%
+
+# Moving windows
+
+df_dates = df.assign(date = pandas.Timestamp("2024-01-01") + pandas.to_timedelta(numpy.arange(len(df)) % 60, unit = "D"))
+
+## Last row should match effectsize.compute() for the last 30 days
+effectsize.compute_windows(data = df_dates,
+                           group = "group",
+                           time = "date",
+                           continuous = ["var1", "var2"],
+                           categorical = ["var3", "var4"],
+                           window = 30)
+
+effectsize.compute(data = df_dates[df_dates["date"] >= pandas.Timestamp("2024-01-31")],
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   categorical = ["var3", "var4"])
+
+## With weights
+effectsize.compute_windows(data = df_dates,
+                           group = "group",
+                           time = "date",
+                           continuous = ["var1", "var2"],
+                           categorical = ["var3", "var4"],
+                           weights = "wgt",
+                           window = 30)
+
+
+#%%
+
+# Batch computation
+
+import os
+import json
+import batch
+
+directory = tempfile.mkdtemp()
+df.to_csv(os.path.join(directory, "cohort.csv"), index = False)
+
+manifest = {"inputs": {"cohort": os.path.join(directory, "cohort.csv")},
+            "specs": [{"name": "unweighted", "input": "cohort", "group": "group", "continuous": ["var1", "var2"], "categorical": ["var3", "var4"], "skewed": ["var2"]},
+                      {"name": "weighted", "input": "cohort", "group": "group", "continuous": ["var1", "var2"], "skewed": ["var2"], "weights": "wgt", "intervals": 0.95},
+                      {"name": "metrics", "input": "cohort", "group": "group", "continuous": ["var1"], "metrics": ["ks"]}]}
+
+with open(os.path.join(directory, "manifest.json"), "w") as file:
+    json.dump(manifest, file)
+
+batch.main([os.path.join(directory, "manifest.json"), "--output", os.path.join(directory, "results"), "--workers", "2"])
+
+## Should match effectsize.compute()
+pandas.read_csv(os.path.join(directory, "results", "unweighted.csv"), index_col = 0)
+pandas.read_csv(os.path.join(directory, "results", "weighted.csv"), index_col = 0)
+
+
+#%%
+
+# Matched samples
+
+df_matched = df.assign(matched = numpy.arange(len(df)) % 3,
+                       matchset = numpy.where(numpy.arange(len(df)) % 4 == 0, numpy.nan, numpy.arange(len(df)) // 2))
+
+## Should match effectsize.compute() for the repeated observations
+effectsize.compute(data = df_matched,
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   categorical = ["var3", "var4"],
+                   skewed = ["var2"],
+                   frequencies = "matched",
+                   intervals = 0.95)
+
+effectsize.compute(data = df_matched.loc[df_matched.index.repeat(df_matched["matched"])],
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   categorical = ["var3", "var4"],
+                   skewed = ["var2"],
+                   intervals = 0.95)
+
+## Matched-set IDs, with weights
+effectsize.compute(data = df_matched,
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   categorical = ["var3", "var4"],
+                   weights = "wgt",
+                   matches = "matchset")
+
+## Arrays of frequencies for a prepared cohort
+cohort.compute(frequencies = df_matched["matched"].to_numpy())
+
+
+#%%
+
+# Clustered data
+
+df_panel = df.assign(patient = numpy.arange(len(df)))
+df_panel = df_panel.loc[df_panel.index.repeat(numpy.arange(len(df)) % 4 + 1)].reset_index(drop = True)
+df_panel["var1"] = df_panel["var1"] + numpy.sin(numpy.arange(len(df_panel)))
+
+## Should match effectsize.compute() for the data aggregated to one row per patient
+effectsize.compute(data = df_panel,
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   categorical = ["var3", "var4"],
+                   skewed = ["var2"],
+                   cluster = "patient",
+                   intervals = 0.95)
+
+effectsize.compute(data = df_panel.groupby("patient").agg({"group": "first", "var1": "mean", "var2": "mean", "var3": "first", "var4": "first"}),
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   categorical = ["var3", "var4"],
+                   skewed = ["var2"],
+                   intervals = 0.95)
+
+## With weights
+effectsize.compute(data = df_panel,
+                   group = "group",
+                   continuous = ["var1", "var2"],
+                   categorical = ["var3", "var4"],
+                   weights = "wgt",
+                   cluster = "patient")
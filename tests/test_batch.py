@@ -0,0 +1,103 @@
+# Testing the effectsize-batch command against effectsize.compute() for the simulated data
+
+import os
+import json
+import numpy
+import pandas
+import pytest
+import effectsize
+import batch
+
+@pytest.fixture
+def inputs(df, tmp_path):
+    
+    path = os.path.join(str(tmp_path), "cohort.csv")
+    df.to_csv(path, index = False)
+    
+    return {"cohort": path}
+
+def run(tmp_path, inputs, specs):
+    
+    # Writing the manifest and running the command, returning the exit code
+    
+    manifest = os.path.join(str(tmp_path), "manifest.json")
+    
+    with open(manifest, "w") as file:
+        json.dump({"inputs": inputs, "specs": specs}, file)
+    
+    return batch.main([manifest, "--output", os.path.join(str(tmp_path), "results"), "--quiet"])
+
+def read(tmp_path, name):
+    
+    return pandas.read_csv(os.path.join(str(tmp_path), "results", name + ".csv"), index_col = 0)
+
+#%%
+
+def test_specs(df, tmp_path, inputs):
+    
+    specs = [{"name": "unweighted", "input": "cohort", "group": "group", "continuous": ["var1", "var2"], "categorical": ["var3", "var4"], "skewed": ["var2"]},
+             {"name": "weighted", "input": "cohort", "group": "group", "continuous": ["var1", "var2"], "skewed": ["var2"], "weights": "wgt", "decimals": 6}]
+    
+    assert run(tmp_path, inputs, specs) == 0
+    
+    for spec in specs:
+        
+        arguments = {key: value for key, value in spec.items() if key not in ["name", "input"]}
+        expected = effectsize.compute(data = df, **arguments)
+        
+        numpy.testing.assert_allclose(read(tmp_path, spec["name"])["ES"], expected["ES"])
+
+def test_conflicts(df, tmp_path, inputs):
+    
+    # Specs which use a variable differently (here ranked and raw) are computed from separate cohorts
+    
+    specs = [{"name": "ranked", "input": "cohort", "group": "group", "continuous": ["var1", "var2"], "skewed": ["var2"]},
+             {"name": "raw", "input": "cohort", "group": "group", "continuous": ["var2"], "categorical": ["var3"]},
+             {"name": "shared", "input": "cohort", "group": "group", "continuous": ["var1"], "categorical": ["var4"], "weights": "wgt"}]
+    
+    assert run(tmp_path, inputs, specs) == 0
+    
+    for spec in specs:
+        
+        arguments = {key: value for key, value in spec.items() if key not in ["name", "input"]}
+        expected = effectsize.compute(data = df, **arguments)
+        
+        numpy.testing.assert_allclose(read(tmp_path, spec["name"])["ES"], expected["ES"])
+    
+    cohorts = batch.prepare_cohorts(data = df, specs = specs)
+    
+    assert cohorts["ranked"] is cohorts["shared"] and cohorts["ranked"] is not cohorts["raw"]
+
+def test_columns(df, tmp_path, inputs):
+    
+    # Columns used by arguments other than the variables and weights are read from the input
+    
+    df = df.assign(matched = numpy.arange(len(df)) % 3, matchset = numpy.where(numpy.arange(len(df)) % 4 == 0, numpy.nan, numpy.arange(len(df)) // 2),
+                   patient = df["group"].astype(str) + "-" + (numpy.arange(len(df)) % 50).astype(str))
+    df.to_csv(inputs["cohort"], index = False)
+    
+    specs = [{"name": "frequencies", "input": "cohort", "group": "group", "continuous": ["var1"], "categorical": ["var3"], "frequencies": "matched"},
+             {"name": "matches", "input": "cohort", "group": "group", "continuous": ["var1"], "categorical": ["var3"], "matches": "matchset", "weights": "wgt"},
+             {"name": "cluster", "input": "cohort", "group": "group", "continuous": ["var1"], "categorical": ["var3"], "cluster": "patient", "decimals": 4}]
+    
+    assert run(tmp_path, inputs, specs) == 0
+    
+    for spec in specs:
+        
+        arguments = {key: value for key, value in spec.items() if key not in ["name", "input"]}
+        expected = effectsize.compute(data = df, **arguments)
+        
+        numpy.testing.assert_allclose(read(tmp_path, spec["name"])["ES"], expected["ES"])
+
+def test_failures(df, tmp_path, inputs):
+    
+    # A failing spec (or input) is logged and skipped, the other results are still written, and the exit code is 1
+    
+    specs = [{"name": "failing", "input": "cohort", "group": "group", "continuous": ["var1"], "permutations": 0},
+             {"name": "unreadable", "input": "missing", "group": "group", "continuous": ["var1"]},
+             {"name": "passing", "input": "cohort", "group": "group", "continuous": ["var1"]}]
+    
+    assert run(tmp_path, dict(inputs, missing = os.path.join(str(tmp_path), "missing.csv")), specs) == 1
+    
+    assert not os.path.exists(os.path.join(str(tmp_path), "results", "failing.csv"))
+    numpy.testing.assert_allclose(read(tmp_path, "passing")["ES"], effectsize.compute(data = df, group = "group", continuous = ["var1"])["ES"])
@@ -0,0 +1,384 @@
+# Testing that the fast paths give the same SDs as compute_means() and compute_categorical(), for randomized data
+
+import os
+import asyncio
+import numpy
+import pandas
+import scipy.sparse
+import scipy.stats
+import pytest
+import effectsize
+import functions
+
+seeds = range(5)
+continuous = ["normal", "exponential", "integer"]
+categorical = ["binary", "levels"]
+
+def reference(data, weights, variables = continuous + categorical, skewed = [], decimals = 10, intervals = None):
+    
+    # SDs computed row by row with compute_means() and compute_categorical(), as in compute() without any options
+    
+    return effectsize.compute(data = data, group = "group", continuous = [variable for variable in variables if variable in continuous],
+                              categorical = [variable for variable in variables if variable in categorical], skewed = skewed,
+                              weights = weights, decimals = decimals, intervals = intervals)
+
+def weights_array(data, weights):
+    
+    return None if weights == None else data[weights].to_numpy(dtype = numpy.float64)
+
+#%%
+
+def test_copy():
+    
+    # The tests use the modules of the src directory, of which tests/functions.py (used by unit_tests.py) must be an exact copy
+    
+    source = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    
+    assert os.path.dirname(os.path.abspath(functions.__file__)) == source
+    assert open(functions.__file__, "rb").read() == open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "functions.py"), "rb").read()
+
+@pytest.mark.parametrize("weights", [None, "wgt"])
+@pytest.mark.parametrize("seed", seeds)
+def test_moments(make_data, seed, weights):
+    
+    data = make_data(seed = seed)
+    codes = functions.compute_codes(data["group"])
+    
+    for variable in continuous:
+        
+        expected = functions.compute_means(data = data, group = "group", variable = variable, weights = weights)
+        
+        moments = functions.compute_moments(values = data[variable].to_numpy(), codes = codes, weights = weights_array(data, weights))
+        numpy.testing.assert_allclose(functions.summarize_moments(moments = moments), expected, rtol = 1e-10)
+        
+        blocked = functions.compute_blocked_moments(values = data[variable].to_numpy(), codes = codes, weights = weights_array(data, weights), workers = 3)
+        numpy.testing.assert_allclose(functions.summarize_moments(moments = blocked), expected, rtol = 1e-10)
+
+@pytest.mark.parametrize("weights", [None, "wgt"])
+@pytest.mark.parametrize("seed", seeds)
+def test_workers(make_data, seed, weights):
+    
+    data = make_data(seed = seed)
+    
+    expected = reference(data, weights, skewed = ["exponential"], intervals = 0.95)
+    results = effectsize.compute(data = data, group = "group", continuous = continuous, categorical = categorical, skewed = ["exponential"],
+                                 weights = weights, decimals = 10, intervals = 0.95, workers = 3)
+    
+    numpy.testing.assert_allclose(results["ES"], expected["ES"], atol = 1e-9)
+    numpy.testing.assert_allclose(numpy.array(results["95.0% CI"].tolist()), numpy.array(expected["95.0% CI"].tolist()), atol = 1e-9)
+
+@pytest.mark.parametrize("weights", [None, "wgt"])
+@pytest.mark.parametrize("seed", seeds)
+def test_chunksize(make_data, seed, weights):
+    
+    data = make_data(seed = seed)
+    
+    expected = reference(data, weights, variables = continuous, skewed = continuous)
+    results = effectsize.compute(data = data, group = "group", continuous = continuous, skewed = continuous, weights = weights, decimals = 10, chunksize = 37)
+    
+    numpy.testing.assert_allclose(results["ES"], expected["ES"], atol = 1e-9)
+
+@pytest.mark.parametrize("weights", [None, "wgt"])
+@pytest.mark.parametrize("seed", seeds)
+def test_infinite(make_data, seed, weights):
+    
+    # Repeated infinite values are ties, ranked as in Series.rank(method = 'average')
+    
+    data = make_data(seed = seed)
+    infinite = numpy.random.default_rng(seed = [seed, 1]).choice([numpy.inf, -numpy.inf, 0.0], p = [0.1, 0.05, 0.85], size = len(data))
+    data["exponential"] = data["exponential"] + infinite
+    data["ranks"] = data["exponential"].rank(method = "average")
+    
+    values = data["exponential"].to_numpy()
+    
+    numpy.testing.assert_array_equal(functions.compute_distribution(values = values, codes = functions.compute_codes(data["group"]))[0], data["ranks"])
+    numpy.testing.assert_array_equal(functions.compute_frequency_ranks(values = values, frequencies = numpy.ones(len(data))), data["ranks"])
+    
+    expected = effectsize.compute(data = data, group = "group", continuous = ["ranks"], weights = weights, decimals = 10)["ES"].to_numpy()
+    
+    for arguments in [{}, {"chunksize": 97}]:
+        
+        results = effectsize.compute(data = data, group = "group", continuous = ["exponential"], skewed = ["exponential"], weights = weights, decimals = 10, **arguments)
+        numpy.testing.assert_allclose(results["ES"], expected, atol = 1e-9)
+    
+    cohort = effectsize.prepare(data = data, group = "group", continuous = ["exponential"], skewed = ["exponential"])
+    numpy.testing.assert_allclose(cohort.compute(weights = weights, decimals = 10)["ES"], expected, atol = 1e-9)
+
+@pytest.mark.parametrize("weights", [None, "wgt"])
+@pytest.mark.parametrize("seed", seeds)
+def test_sparse(make_data, seed, weights):
+    
+    data = make_data(seed = seed)
+    sparse = data.assign(integer = pandas.arrays.SparseArray(data["integer"], fill_value = 0),
+                         binary = pandas.arrays.SparseArray(data["binary"], fill_value = 0))
+    
+    expected = reference(data, weights, variables = ["integer", "binary"], intervals = 0.95)
+    results = reference(sparse, weights, variables = ["integer", "binary"], intervals = 0.95)
+    
+    numpy.testing.assert_allclose(results["ES"], expected["ES"], atol = 1e-9)
+
+@pytest.mark.parametrize("weights", [None, "wgt"])
+@pytest.mark.parametrize("seed", seeds)
+def test_sparse_stored(make_data, seed, weights):
+    
+    # Stored entries equal to the fill value (explicit zeros of a scipy.sparse matrix), stored missing values, and values far from zero
+    
+    data = make_data(seed = seed).assign(normal = lambda data: data["normal"] + 1e7)
+    values = data["binary"].to_numpy()
+    rows = numpy.flatnonzero((values != 0) | (numpy.random.default_rng(seed = [seed, 1]).random(size = len(data)) < 0.5))
+    matrix = scipy.sparse.csc_matrix((values[rows], (rows, numpy.zeros(len(rows), dtype = int))), shape = (len(data), 1))
+    
+    sparse = data.assign(normal = pandas.arrays.SparseArray(data["normal"], fill_value = 0),
+                         binary = pandas.DataFrame.sparse.from_spmatrix(matrix)[0].array)
+    
+    expected = reference(data, weights, variables = ["normal", "binary"], intervals = 0.95)
+    results = reference(sparse, weights, variables = ["normal", "binary"], intervals = 0.95)
+    
+    numpy.testing.assert_allclose(results["ES"], expected["ES"], atol = 1e-9)
+    
+    # Screening a scipy.sparse matrix of values far from zero
+    
+    block = data[["normal", "integer"]].fillna(1e7).to_numpy()
+    codes = functions.compute_codes(data["group"])
+    
+    numpy.testing.assert_allclose(functions.compute_screening(block = scipy.sparse.csr_matrix(block), codes = codes, weights = weights_array(data, weights)),
+                                  functions.compute_screening(block = block, codes = codes, weights = weights_array(data, weights)), atol = 1e-9)
+
+@pytest.mark.parametrize("weights", [None, "wgt"])
+@pytest.mark.parametrize("seed", seeds)
+def test_screening(make_data, seed, weights):
+    
+    data = make_data(seed = seed)
+    codes = functions.compute_codes(data["group"])
+    
+    results = functions.compute_screening(block = data[continuous + ["binary"]].to_numpy(), codes = codes, weights = weights_array(data, weights))
+    expected = reference(data, weights, variables = continuous + ["binary"])
+    
+    numpy.testing.assert_allclose(results, expected["ES"], atol = 1e-9)
+
+#%%
+
+@pytest.mark.parametrize("weights", [None, "wgt"])
+@pytest.mark.parametrize("seed", seeds)
+def test_cohort(make_data, seed, weights):
+    
+    data = make_data(seed = seed)
+    expected = reference(data, weights, skewed = ["exponential"], intervals = 0.95)
+    
+    for compact, downcast, tolerance in [(False, False, 1e-9), (True, False, 1e-9), (True, True, 1e-5)]:
+        
+        cohort = effectsize.prepare(data = data, group = "group", continuous = continuous, categorical = categorical, skewed = ["exponential"], compact = compact,
+                                    downcast = downcast)
+        results = cohort.compute(weights = weights, decimals = 10, intervals = 0.95)
+        
+        numpy.testing.assert_allclose(results["ES"], expected["ES"], atol = tolerance)
+        numpy.testing.assert_allclose(numpy.array(results["95.0% CI"].tolist()), numpy.array(expected["95.0% CI"].tolist()), atol = tolerance)
+
+def test_compact_integers(make_data):
+    
+    # Integer variables are stored in the narrowest integer type which fits them, so that their values (e.g. above 2 ** 24 for int32) are unchanged
+    
+    data = make_data(seed = 0)
+    generator = numpy.random.default_rng(seed = 0)
+    data["small"] = generator.integers(-1000, 1000, size = len(data)).astype(numpy.int16)
+    data["unsigned"] = generator.integers(0, 60000, size = len(data)).astype(numpy.uint16)
+    data["large"] = (2 ** 24 + 1 + generator.integers(0, 3, size = len(data)) * 1000003 + numpy.where(data["group"] == 1, 7, 0)).astype(numpy.int32)
+    
+    integers = ["small", "unsigned", "large"]
+    cohort = effectsize.prepare(data = data, group = "group", continuous = integers, compact = True)
+    
+    assert [cohort.values[variable].dtype for variable in integers] == [numpy.int16, numpy.int32, numpy.int32]
+    assert (cohort.values["large"] == data["large"].to_numpy()).all()
+    
+    pandas.testing.assert_frame_equal(cohort.compute(decimals = 10), effectsize.compute(data = data, group = "group", continuous = integers, decimals = 10))
+
+@pytest.mark.parametrize("weights", [None, "wgt"])
+@pytest.mark.parametrize("seed", seeds)
+def test_matched(make_data, seed, weights):
+    
+    data = make_data(seed = seed)
+    generator = numpy.random.default_rng(seed = [seed, 1])
+    data["frequency"] = generator.integers(0, 4, size = len(data))
+    data["matchset"] = numpy.where(generator.random(size = len(data)) < 0.6, numpy.arange(len(data)) // 3, numpy.nan)
+    
+    repeated = data.loc[data.index.repeat(data["frequency"])]
+    matched = data[data["matchset"].notna()]
+    
+    for sample, arguments in [(repeated, {"frequencies": "frequency"}), (matched, {"matches": "matchset"})]:
+        
+        expected = reference(sample, weights, skewed = ["exponential", "integer"], intervals = 0.95)
+        results = effectsize.compute(data = data, group = "group", continuous = continuous, categorical = categorical, skewed = ["exponential", "integer"],
+                                     weights = weights, decimals = 10, intervals = 0.95, **arguments)
+        
+        numpy.testing.assert_allclose(results["ES"], expected["ES"], atol = 1e-9)
+        numpy.testing.assert_allclose(numpy.array(results["95.0% CI"].tolist()), numpy.array(expected["95.0% CI"].tolist()), atol = 1e-9)
+
+@pytest.mark.parametrize("weights", [None, "wgt"])
+@pytest.mark.parametrize("seed", seeds)
+def test_cluster(make_data, seed, weights):
+    
+    data = make_data(seed = seed).assign(patient = lambda data: numpy.arange(len(data)))
+    generator = numpy.random.default_rng(seed = [seed, 1])
+    
+    panel = data.loc[data.index.repeat(generator.integers(1, 5, size = len(data)))].reset_index(drop = True)
+    panel["normal"] = panel["normal"] + generator.normal(size = len(panel))
+    
+    aggregated = panel.groupby("patient").agg({"group": "first", "wgt": "mean", "normal": "mean", "exponential": "mean", "integer": "mean", "binary": "first", "levels": "first"})
+    
+    expected = reference(aggregated, weights, skewed = ["exponential"], intervals = 0.95)
+    results = effectsize.compute(data = panel, group = "group", continuous = continuous, categorical = categorical, skewed = ["exponential"],
+                                 weights = weights, decimals = 10, intervals = 0.95, cluster = "patient")
+    
+    numpy.testing.assert_allclose(results["ES"], expected["ES"], atol = 1e-9)
+    numpy.testing.assert_allclose(numpy.array(results["95.0% CI"].tolist()), numpy.array(expected["95.0% CI"].tolist()), atol = 1e-9)
+
+@pytest.mark.parametrize("weights", [None, "wgt"])
+@pytest.mark.parametrize("seed", seeds)
+def test_terms(make_data, seed, weights):
+    
+    data = make_data(seed = seed)
+    materialized = data.assign(**{"normal^2": data["normal"] ** 2, "integer^2": data["integer"] ** 2, "normal * integer": data["normal"] * data["integer"]})
+    
+    expected = effectsize.compute(data = materialized, group = "group", continuous = ["normal^2", "integer^2", "normal * integer"], weights = weights, decimals = 10)
+    results = effectsize.compute(data = data, group = "group", continuous = ["normal", "integer"], weights = weights, decimals = 10, terms = ["squares", "products"])
+    
+    numpy.testing.assert_allclose(results["ES"].iloc[2:], expected["ES"], atol = 1e-9)
+
+@pytest.mark.parametrize("weights", [None, "wgt"])
+@pytest.mark.parametrize("seed", seeds)
+def test_windows(make_data, seed, weights):
+    
+    data = make_data(seed = seed)
+    data["date"] = pandas.Timestamp("2024-01-01") + pandas.to_timedelta(numpy.random.default_rng(seed = [seed, 1]).integers(0, 120 * 24, size = len(data)), unit = "h")
+    
+    results = effectsize.compute_windows(data = data, group = "group", time = "date", continuous = ["normal", "integer"], categorical = categorical,
+                                         weights = weights, window = 60, decimals = 10)
+    
+    for day in results.index[[59, 90, -1]]:
+        
+        window = data[(data["date"] < day + pandas.Timedelta(days = 1)) & (data["date"] >= day - pandas.Timedelta(days = 59))]
+        expected = reference(window, weights, variables = ["normal", "integer"] + categorical)
+        
+        numpy.testing.assert_allclose(results.loc[day], expected["ES"], atol = 1e-9)
+
+@pytest.mark.parametrize("seed", seeds)
+def test_pooled(make_data, seed):
+    
+    # Identical imputed datasets should pool to the SDs of a single dataset
+    
+    data = make_data(seed = seed, missing = 0.0)
+    stacked = pandas.concat([data.assign(imputation = imputation) for imputation in range(3)], ignore_index = True)
+    
+    expected = reference(data, None, skewed = ["exponential"])
+    results = effectsize.compute_pooled(data = stacked, group = "group", imputation = "imputation", continuous = continuous, categorical = categorical,
+                                        skewed = ["exponential"], decimals = 10)
+    
+    numpy.testing.assert_allclose(results["ES"], expected["ES"], atol = 1e-9)
+
+#%%
+
+@pytest.mark.parametrize("seed", seeds)
+def test_metrics(make_data, seed):
+    
+    data = make_data(seed = seed)
+    results = effectsize.compute(data = data, group = "group", continuous = ["normal"], decimals = 10, metrics = ["variance", "ks"])
+    
+    group0 = data.loc[data["group"] == 0, "normal"].dropna()
+    group1 = data.loc[data["group"] == 1, "normal"].dropna()
+    
+    numpy.testing.assert_allclose(results["Variance ratio"], group1.var() / group0.var(), rtol = 1e-9)
+    numpy.testing.assert_allclose(results["KS"], scipy.stats.ks_2samp(group0, group1).statistic, atol = 1e-9)
+
+@pytest.mark.parametrize("seed", seeds)
+def test_permutations(make_data, seed):
+    
+    # The p-values are reproducible with a seed and do not depend on the number of workers
+    
+    data = make_data(seed = seed)
+    arguments = {"data": data, "group": "group", "continuous": continuous, "categorical": categorical, "permutations": 200, "seed": seed}
+    
+    first = effectsize.compute(**arguments)
+    second = effectsize.compute(workers = 3, **arguments)
+    
+    numpy.testing.assert_array_equal(first["p-value"], second["p-value"])
+    assert ((first["p-value"] > 0) & (first["p-value"] <= 1)).all()
+
+@pytest.mark.parametrize("weights", [None, "wgt"])
+@pytest.mark.parametrize("seed", seeds)
+def test_permutations_skewed(make_data, seed, weights):
+    
+    # The p-values of skewed variables are for the ranks from which the SD is computed (over all non-missing values, including rows without a group or weight)
+    
+    data = make_data(seed = seed).assign(ranks = lambda data: data["exponential"].rank(method = "average"))
+    arguments = {"data": data, "group": "group", "weights": weights, "decimals": 10, "permutations": 200, "seed": seed}
+    
+    skewed = effectsize.compute(continuous = ["exponential"], skewed = ["exponential"], **arguments)
+    ranks = effectsize.compute(continuous = ["ranks"], **arguments)
+    
+    numpy.testing.assert_allclose(skewed["ES"], ranks["ES"], atol = 1e-9)
+    numpy.testing.assert_array_equal(skewed["p-value"], ranks["p-value"])
+
+@pytest.mark.parametrize("seed", seeds)
+def test_dask(make_data, seed):
+    
+    dask = pytest.importorskip("dask.dataframe")
+    
+    data = make_data(seed = seed)
+    variables = ["normal", "integer"] + categorical
+    
+    expected = reference(data, "wgt", variables = variables, intervals = 0.95)
+    results = effectsize.compute(data = dask.from_pandas(data, npartitions = 3), group = "group", continuous = ["normal", "integer"], categorical = categorical,
+                                 weights = "wgt", decimals = 10, intervals = 0.95)
+    
+    numpy.testing.assert_allclose(results["ES"], expected["ES"], atol = 1e-9)
+
+def test_async(make_data):
+    
+    data = make_data(seed = 0)
+    
+    expected = reference(data, "wgt", skewed = ["exponential"])
+    results = asyncio.run(effectsize.compute_async(data = data, group = "group", continuous = continuous, categorical = categorical,
+                                                   skewed = ["exponential"], weights = "wgt", decimals = 10))
+    
+    numpy.testing.assert_allclose(results["ES"], expected["ES"], atol = 1e-12)
+
+def test_cache(make_data):
+    
+    data = make_data(seed = 0)
+    cache = effectsize.MemoryCache()
+    
+    first = effectsize.compute(data = data, group = "group", continuous = continuous, categorical = categorical, cache = cache)
+    second = effectsize.compute(data = data, group = "group", continuous = continuous, categorical = categorical, cache = cache)
+    
+    pandas.testing.assert_frame_equal(first, second)
+    assert cache.info()["hits"] == 1 and cache.info()["misses"] == 1
+
+@pytest.mark.parametrize("name", ["stat", "utime", "remove"])
+def test_disk_cache_shared(tmp_path, monkeypatch, name):
+    
+    # A file removed by another process sharing the directory (just before it is checked, touched or removed) is a miss rather than an error
+    
+    import types
+    import caching
+    
+    cache = effectsize.DiskCache(directory = str(tmp_path), maxbytes = 1, ttl = 3600)
+    cache.set("first", 1)
+    
+    def removed(path, *args, **kwargs):
+        
+        if os.path.exists(path):
+            os.unlink(path)
+        
+        return getattr(os, name)(path, *args, **kwargs)
+    
+    # Only the os functions called by the cache are replaced
+    
+    monkeypatch.setattr(caching, "os", types.SimpleNamespace(**dict(vars(os), **{name: removed})))
+    cache.ttl = 0 if name == "remove" else 3600
+    
+    cache.set("second", 2)
+    
+    # (a result already read when its file is removed is still returned)
+    
+    assert cache.get("first") == None and cache.get("second") == (2 if name == "utime" else None)
+    assert len(cache) == 0
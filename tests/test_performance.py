@@ -0,0 +1,88 @@
+# Timing budgets for the hot paths, which fail if a change makes them markedly slower
+# Budgets are in seconds for 200000 rows, about ten times the times on a laptop, and can be scaled for slower machines e.g. EFFECTSIZE_TIME_SCALE=3
+
+import os
+import time
+import numpy
+import pandas
+import pytest
+import effectsize
+import functions
+
+pytestmark = pytest.mark.performance
+
+scale = float(os.environ.get("EFFECTSIZE_TIME_SCALE", "1"))
+continuous = ["cont" + str(i) for i in range(5)]
+
+@pytest.fixture(scope = "module")
+def large():
+    
+    generator = numpy.random.default_rng(seed = 42)
+    rows = 200000
+    
+    data = pandas.DataFrame({"group": generator.integers(0, 2, size = rows),
+                             "wgt": generator.uniform(0.5, 2.0, size = rows),
+                             "cat": generator.integers(0, 10, size = rows),
+                             "date": pandas.Timestamp("2024-01-01") + pandas.to_timedelta(generator.integers(0, 365 * 24, size = rows), unit = "h")})
+    
+    for variable in continuous:
+        data[variable] = generator.normal(size = rows)
+    
+    return data
+
+def timing(function, repeats = 3):
+    
+    # Best of a few runs, so that a single slow run (e.g. garbage collection) does not fail the budget
+    
+    times = []
+    
+    for repeat in range(repeats):
+        
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    
+    return min(times)
+
+#%%
+
+def test_moments(large):
+    
+    codes = functions.compute_codes(large["group"])
+    values = large[continuous].to_numpy()
+    weights = large["wgt"].to_numpy()
+    
+    assert timing(lambda: functions.compute_moments(values = values, codes = codes, weights = weights)) < 0.5 * scale
+
+def test_distribution(large):
+    
+    codes = functions.compute_codes(large["group"])
+    values = large["cont0"].to_numpy()
+    
+    assert timing(lambda: functions.compute_distribution(values = values, codes = codes)) < 0.5 * scale
+
+def test_cohort(large):
+    
+    cohort = effectsize.prepare(data = large, group = "group", continuous = continuous, categorical = ["cat"])
+    
+    assert timing(lambda: cohort.compute(weights = "wgt")) < 0.75 * scale
+
+def test_cohort_relative(large):
+    
+    # Prepared cohorts should remain much faster than compute(), whatever the speed of the machine
+    
+    cohort = effectsize.prepare(data = large, group = "group", continuous = continuous, categorical = ["cat"])
+    
+    fast = timing(lambda: cohort.compute(weights = "wgt"))
+    slow = timing(lambda: effectsize.compute(data = large, group = "group", continuous = continuous, categorical = ["cat"], weights = "wgt"), repeats = 1)
+    
+    assert fast * 3 < slow
+
+def test_screen(large):
+    
+    assert timing(lambda: effectsize.screen(data = large, group = "group", variables = continuous + ["cat"], weights = "wgt")) < 0.75 * scale
+
+def test_windows(large):
+    
+    assert timing(lambda: effectsize.compute_windows(data = large, group = "group", time = "date", continuous = continuous, categorical = ["cat"],
+                                                     weights = "wgt", window = 90)) < 1.0 * scale
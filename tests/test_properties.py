@@ -0,0 +1,88 @@
+# Property-based tests of the sufficient statistics against compute_means() and compute_categorical(), for data generated by hypothesis
+
+import numpy
+import pandas
+import pytest
+import effectsize
+import functions
+
+hypothesis = pytest.importorskip("hypothesis")
+
+from hypothesis import given, settings, assume, strategies
+
+values = strategies.floats(min_value = -1e3, max_value = 1e3, allow_nan = False).map(lambda value: round(value, 3))
+weights = strategies.floats(min_value = 0.1, max_value = 10.0).map(lambda value: round(value, 3))
+
+@strategies.composite
+def observations(draw, minimum = 6, maximum = 60):
+    
+    # Group, weight, continuous value and categorical level of each observation, with at least two observations in each group
+    
+    rows = draw(strategies.integers(min_value = minimum, max_value = maximum))
+    group = draw(strategies.lists(strategies.sampled_from([0, 1]), min_size = rows, max_size = rows))
+    
+    assume(group.count(0) >= 2 and group.count(1) >= 2)
+    
+    return pandas.DataFrame({"group": group,
+                             "wgt": draw(strategies.lists(weights, min_size = rows, max_size = rows)),
+                             "value": draw(strategies.lists(values, min_size = rows, max_size = rows)),
+                             "level": draw(strategies.lists(strategies.sampled_from(["a", "b", "c"]), min_size = rows, max_size = rows))})
+
+def moments(data, weighted, rows = slice(None)):
+    
+    # Group codes are computed for all observations, as a block of rows may contain a single group
+    
+    return functions.compute_moments(values = data["value"].to_numpy()[rows], codes = functions.compute_codes(data["group"])[rows],
+                                     weights = data["wgt"].to_numpy()[rows] if weighted else None)
+
+#%%
+
+@settings(max_examples = 100, deadline = None)
+@given(data = observations(), weighted = strategies.booleans())
+def test_summarize_moments(data, weighted):
+    
+    expected = functions.compute_means(data = data, group = "group", variable = "value", weights = "wgt" if weighted else None)
+    
+    numpy.testing.assert_allclose(functions.summarize_moments(moments(data, weighted)), expected, rtol = 1e-7, atol = 1e-6)
+
+@settings(max_examples = 100, deadline = None)
+@given(data = observations(), weighted = strategies.booleans(), split = strategies.data())
+def test_combine_moments(data, weighted, split):
+    
+    # Combining the statistics of any two blocks of rows (either of which may be empty) gives the statistics of all rows
+    
+    row = split.draw(strategies.integers(min_value = 0, max_value = len(data)))
+    combined = functions.combine_moments(moments(data, weighted, slice(None, row)), moments(data, weighted, slice(row, None)))
+    
+    numpy.testing.assert_allclose(combined, moments(data, weighted), rtol = 1e-7, atol = 1e-6)
+
+@settings(max_examples = 100, deadline = None)
+@given(data = observations(), scale = strategies.sampled_from([-2.5, 0.5, 4.0]), shift = values)
+def test_stdiff_affine(data, scale, shift):
+    
+    # SDs are unchanged by a shift of the values, and change sign with a negative scale
+    
+    assume(data.groupby("group")["value"].var().min() > 1e-3)
+    
+    stdiff = functions.compute_stdiff(moments = moments(data, False))
+    transformed = functions.compute_stdiff(moments = moments(data.assign(value = data["value"] * scale + shift), False))
+    
+    numpy.testing.assert_allclose(transformed, numpy.sign(scale) * stdiff, rtol = 1e-6, atol = 1e-8)
+
+#%%
+
+@settings(max_examples = 50, deadline = None)
+@given(data = observations(minimum = 30), weighted = strategies.booleans())
+def test_cohort(data, weighted):
+    
+    # Prepared cohorts give the same SDs as compute_means() and compute_categorical() row by row
+    
+    assume(data.groupby("group")["value"].var().min() > 1e-3)
+    assume(data.groupby("group")["level"].nunique().min() == 3)
+    
+    weights = "wgt" if weighted else None
+    
+    expected = effectsize.compute(data = data, group = "group", continuous = ["value"], categorical = ["level"], weights = weights, decimals = 8)
+    cohort = effectsize.prepare(data = data, group = "group", continuous = ["value"], categorical = ["level"])
+    
+    numpy.testing.assert_allclose(cohort.compute(weights = weights, decimals = 8)["ES"], expected["ES"], atol = 2e-8)
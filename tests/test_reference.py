@@ -0,0 +1,94 @@
+# Testing effectsize.compute() against reference values for the simulated data (see README.md)
+
+import numpy
+import pytest
+import effectsize
+
+variables = {"continuous": ["var1", "var2"], "categorical": ["var3", "var4"], "skewed": ["var2"]}
+
+#%%
+
+def test_continuous(df):
+    
+    results = effectsize.compute(data = df, group = "group", continuous = ["var1", "var2"])
+    
+    assert list(results.index.get_level_values(0)) == ["var1", "var2"]
+    numpy.testing.assert_allclose(results["ES"], [0.16, -0.20])
+
+def test_skewed(df):
+    
+    results = effectsize.compute(data = df, group = "group", continuous = ["var1", "var2"], skewed = ["var2"])
+    
+    numpy.testing.assert_allclose(results["ES"], [0.16, -0.11])
+
+def test_categorical(df):
+    
+    results = effectsize.compute(data = df, group = "group", categorical = ["var3", "var4"])
+    
+    numpy.testing.assert_allclose(results["ES"], [0.37, 0.20])
+
+def test_decimals(df):
+    
+    results = effectsize.compute(data = df, group = "group", decimals = 4, **variables)
+    
+    numpy.testing.assert_allclose(results["ES"], [0.1632, -0.1150, 0.3664, 0.1961])
+
+@pytest.mark.parametrize("intervals, label, bounds", [(0.95, "95.0% CI", [[-0.12, 0.44], [-0.39, 0.17], [0.09, 0.65], [-0.08, 0.48]]),
+                                                      (0.99, "99.0% CI", [[-0.20, 0.52], [-0.47, 0.25], [0.00, 0.74], [-0.17, 0.57]])])
+def test_intervals(df, intervals, label, bounds):
+    
+    results = effectsize.compute(data = df, group = "group", intervals = intervals, **variables)
+    
+    numpy.testing.assert_allclose(results["ES"], [0.16, -0.11, 0.37, 0.20])
+    numpy.testing.assert_allclose(numpy.array(results[label].tolist()), bounds)
+
+def test_weighted(df):
+    
+    results = effectsize.compute(data = df, group = "group", weights = "wgt", **variables)
+    
+    numpy.testing.assert_allclose(results["ES"], [0.20, -0.14, 0.40, 0.19])
+
+def test_weighted_intervals(df):
+    
+    results = effectsize.compute(data = df, group = "group", weights = "wgt", decimals = 6, intervals = 0.95, **variables)
+    
+    numpy.testing.assert_allclose(results["ES"], [0.203969, -0.140852, 0.396789, 0.185019])
+    numpy.testing.assert_allclose(numpy.array(results["95.0% CI"].tolist()),
+                                  [[0.176163, 0.231775], [-0.168621, -0.113083], [0.368783, 0.424795], [0.157225, 0.212813]])
+
+def test_unweighted_precision(df):
+    
+    results = effectsize.compute(data = df, group = "group", decimals = 6, intervals = 0.95, **variables)
+    
+    numpy.testing.assert_allclose(results["ES"], [0.163226, -0.114969, 0.366391, 0.196116])
+    numpy.testing.assert_allclose(numpy.array(results["95.0% CI"].tolist()),
+                                  [[-0.114416, 0.440868], [-0.392379, 0.162441], [0.086894, 0.645888], [-0.08173, 0.473962]])
+
+def test_weighted_skewed_unranked(df):
+    
+    results = effectsize.compute(data = df, group = "group", continuous = ["var1", "var2"], weights = "wgt", decimals = 6)
+    
+    numpy.testing.assert_allclose(results["ES"], [0.203969, -0.223360])
+
+#%%
+
+def test_missing_variable(df, capsys):
+    
+    results = effectsize.compute(data = df, group = "group", continuous = ["var1", "missing"])
+    
+    assert list(results.index.get_level_values(0)) == ["var1"]
+    assert "missing" in capsys.readouterr().out
+
+@pytest.mark.parametrize("arguments", [{"group": 1},
+                                       {"continuous": "var1"},
+                                       {"weights": 1},
+                                       {"decimals": 2.0},
+                                       {"intervals": 1.5},
+                                       {"metrics": ["mean"]},
+                                       {"permutations": 0}])
+def test_invalid_inputs(df, arguments):
+    
+    arguments = {"data": df, "group": "group", "continuous": ["var1"], **arguments}
+    
+    with pytest.raises(AssertionError):
+        effectsize.compute(**arguments)
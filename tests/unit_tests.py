@@ -119,3 +119,331 @@ compute_categorical(data = df,
                     group = "group",
                     variable = "var3",
                     decimals = 4)
+
+# compute_codes()
+
+codes = compute_codes(df["group"])
+
+# compute_moments()
+
+## No weights
+compute_moments(values = df["var1"].to_numpy(),
+                codes = codes)
+
+## With weights
+compute_moments(values = df["var1"].to_numpy(),
+                codes = codes,
+                weights = df["wgt"].to_numpy())
+
+## Several variables at once
+compute_moments(values = df[["var1", "var2"]].to_numpy(),
+                codes = codes)
+
+# compute_sparse_moments()
+
+compute_sparse_moments(matrix = scipy.sparse.csr_matrix(df[["var1", "var3"]].to_numpy()),
+                       codes = codes,
+                       weights = df["wgt"].to_numpy())
+
+# combine_moments()
+
+## Should match compute_moments() on all rows
+combine_moments(first = compute_moments(values = df["var1"].to_numpy()[:150], codes = codes[:150]),
+                second = compute_moments(values = df["var1"].to_numpy()[150:], codes = codes[150:]))
+
+# compute_stdiff()
+
+## Should match compute_continuous() before rounding
+compute_stdiff(moments = compute_moments(values = df["var1"].to_numpy(), codes = codes))
+
+## Binary
+compute_stdiff(moments = compute_moments(values = df["var3"].to_numpy(), codes = codes),
+               binary = True)
+
+# compute_screening()
+
+## Dense
+compute_screening(block = df[["var1", "var2", "var3"]].to_numpy(),
+                  codes = codes)
+
+## Sparse
+compute_screening(block = scipy.sparse.csr_matrix(df[["var1", "var2", "var3"]].to_numpy()),
+                  codes = codes,
+                  weights = df["wgt"].to_numpy())
+
+# compute_bounds()
+
+compute_bounds(stdiff = sd,
+               n0 = 100,
+               n1 = 100)
+
+# compute_sparse()
+
+df_sparse = df.astype({"var1": pandas.SparseDtype("float", 0), "var3": pandas.SparseDtype("float", 0)})
+
+## Continuous
+compute_sparse(data = df_sparse,
+               group = "group",
+               variable = "var1",
+               weights = "wgt")
+
+## Binary
+compute_sparse(data = df_sparse,
+               group = "group",
+               variable = "var3",
+               binary = True)
+
+## Should match the dense variables
+compute_continuous(data = df_sparse,
+                   group = "group",
+                   variable = "var1",
+                   intervals = 0.95)
+
+compute_categorical(data = df_sparse,
+                    group = "group",
+                    variable = "var3",
+                    weights = "wgt",
+                    intervals = 0.95)
+
+# compute_ranked()
+
+## Should match compute_moments() on the ranks
+compute_ranked(values = df["var2"].to_numpy(),
+               codes = codes,
+               chunksize = 30)
+
+compute_moments(values = df["var2"].rank().to_numpy(),
+                codes = codes)
+
+## With weights
+compute_ranked(values = df["var2"].to_numpy(),
+               codes = codes,
+               weights = df["wgt"].to_numpy(),
+               chunksize = 30)
+
+## Skewed, out-of-core
+compute_continuous(data = df,
+                   group = "group",
+                   variable = "var2",
+                   skewed = True,
+                   chunksize = 30)
+
+# permute_stdiff()
+
+## Observed labelling, should match compute_stdiff()
+design = df[["var1"]].to_numpy() - df["var1"].mean()
+
+permute_stdiff(labels = codes[None, :],
+               weights = numpy.ones(len(codes)),
+               weighted = design,
+               squared = design ** 2,
+               blocks = [[0, 1, True]])
+
+# compute_permutations()
+
+## No weights
+compute_permutations(data = df,
+                     group = "group",
+                     variables = ["var1", "var2", "var3", "var4"],
+                     continuous = ["var1", "var2"],
+                     skewed = ["var2"],
+                     permutations = 999,
+                     seed = 1234)
+
+## With weights + threads
+compute_permutations(data = df,
+                     group = "group",
+                     variables = ["var1", "var2", "var3", "var4"],
+                     continuous = ["var1", "var2"],
+                     weights = "wgt",
+                     permutations = 999,
+                     seed = 1234,
+                     workers = 4)
+
+# compute_distribution()
+
+## Ranks should match Series.rank(), KS should match scipy.stats.ks_2samp()
+compute_distribution(values = df["var2"].to_numpy(),
+                     codes = codes)
+
+## With weights
+compute_distribution(values = df["var2"].to_numpy(),
+                     codes = codes,
+                     weights = df["wgt"].to_numpy())
+
+## Metrics
+compute_continuous(data = df,
+                   group = "group",
+                   variable = "var2",
+                   skewed = True,
+                   intervals = 0.95,
+                   metrics = ["variance", "ks", "ecdf"])
+
+# compute_mahalanobis()
+
+## Should match compute_categorical() before rounding
+compute_mahalanobis(prob0 = df[df["group"] == 0]["var4"].value_counts(normalize = True, sort = False).sort_index().to_numpy()[None, :],
+                    prob1 = df[df["group"] == 1]["var4"].value_counts(normalize = True, sort = False).sort_index().to_numpy()[None, :])
+
+# compute_imputed()
+
+df_imputed = pandas.concat([df.assign(imp = 0), df.assign(imp = 1, var1 = df["var1"] + 0.1)], ignore_index = True)
+
+## Continuous
+compute_imputed(data = df_imputed,
+                group = "group",
+                imputation = "imp",
+                variable = "var1")
+
+## Skewed + weights
+compute_imputed(data = df_imputed,
+                group = "group",
+                imputation = "imp",
+                variable = "var2",
+                skewed = True,
+                weights = "wgt")
+
+## Categorical
+compute_imputed(data = df_imputed,
+                group = "group",
+                imputation = "imp",
+                variable = "var4",
+                continuous = False)
+
+# pool_stdiff()
+
+pool_stdiff(stdiffs = numpy.array([0.15, 0.17, 0.16]),
+            n0 = numpy.array([100, 100, 100]),
+            n1 = numpy.array([100, 100, 100]),
+            intervals = 0.95)
+
+# split_rows()
+
+split_rows(count = 10,
+           blocks = 3)
+
+# merge_pairwise()
+
+merge_pairwise(partials = [1, 2, 3, 4, 5],
+               combine = lambda first, second: first + second)
+
+# compute_blocked_moments()
+
+## Should match compute_moments()
+compute_blocked_moments(values = df["var1"].to_numpy(),
+                        codes = codes,
+                        weights = df["wgt"].to_numpy(),
+                        workers = 4)
+
+# compute_blocked_table()
+
+compute_blocked_table(categories = pandas.factorize(df["var4"], sort = True)[0],
+                      codes = codes,
+                      workers = 4)
+
+## Row-parallel, should match the single-threaded results
+compute_continuous(data = df,
+                   group = "group",
+                   variable = "var1",
+                   intervals = 0.95,
+                   workers = 4)
+
+compute_categorical(data = df,
+                    group = "group",
+                    variable = "var4",
+                    weights = "wgt",
+                    intervals = 0.95,
+                    workers = 4)
+
+# partition_statistics()
+
+statistics0 = partition_statistics(partition = df.iloc[:120],
+                                   group = "group",
+                                   continuous = ["var1"],
+                                   categorical = ["var4"],
+                                   weights = "wgt")
+
+statistics1 = partition_statistics(partition = df.iloc[120:],
+                                   group = "group",
+                                   continuous = ["var1"],
+                                   categorical = ["var4"],
+                                   weights = "wgt")
+
+# combine_statistics()
+
+combined = combine_statistics(first = statistics0,
+                              second = statistics1)
+
+# finalize_statistics()
+
+## Should match compute_continuous() and compute_categorical() with weights
+finalize_statistics(statistics = combined,
+                    variables = ["var1", "var4"],
+                    intervals = 0.95)
+
+
+#%%
+
+# compute_products()
+
+compute_products(data = df,
+                 group = "group",
+                 variables = ["var1", "var2"],
+                 weights = "wgt",
+                 intervals = 0.95,
+                 blocksize = 50)
+
+
+#%%
+
+# compact_values()
+
+compact_values(column = df["var1"])
+
+## Binary indicator, stored as int8
+compact_values(column = (df["var3"] == df["var3"].iloc[0]).astype(int))
+
+## Downcast to float32
+compact_values(column = df["var1"],
+               downcast = True)
+
+
+#%%
+
+# compute_windowed()
+
+df_dates = df.assign(date = pandas.Timestamp("2024-01-01") + pandas.to_timedelta(numpy.arange(len(df)) % 60, unit = "D"))
+
+compute_windowed(data = df_dates,
+                 group = "group",
+                 time = "date",
+                 variables = ["var1", "var3"],
+                 continuous = ["var1"],
+                 weights = "wgt",
+                 window = 30)
+
+
+#%%
+
+# compute_frequency_ranks()
+
+## Should match the ranks of the repeated variable
+compute_frequency_ranks(values = df["var2"].to_numpy(),
+                        frequencies = numpy.arange(len(df)) % 3)
+
+
+#%%
+
+# compute_clustered()
+
+df_panel = df.assign(patient = numpy.arange(len(df)) // 2)
+df_panel["group"] = df_panel.groupby("patient")["group"].transform("first")
+
+compute_clustered(data = df_panel,
+                  group = "group",
+                  cluster = "patient",
+                  variables = ["var1", "var2", "var3"],
+                  continuous = ["var1", "var2"],
+                  skewed = ["var2"],
+                  weights = "wgt",
+                  intervals = 0.95)